@@ -0,0 +1,28 @@
+"""add content ingestion status
+
+Revision ID: 1c2f7a9d4e01
+Revises: f5b3ec714ffb
+Create Date: 2025-10-12 11:02:31.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c2f7a9d4e01'
+down_revision: Union[str, Sequence[str], None] = 'f5b3ec714ffb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contents', sa.Column('status', sa.String(), server_default='ready', nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('contents', 'status')
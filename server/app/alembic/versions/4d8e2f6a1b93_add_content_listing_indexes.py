@@ -0,0 +1,34 @@
+"""add content listing indexes
+
+Revision ID: 4d8e2f6a1b93
+Revises: 9e4a1b7c3d20
+Create Date: 2025-10-15 09:41:27.502913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d8e2f6a1b93'
+down_revision: Union[str, Sequence[str], None] = '9e4a1b7c3d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # rows saved without a timestamp would sort apart from everything else in the keyset order
+    op.execute("UPDATE contents SET timestamp = 0 WHERE timestamp IS NULL")
+    op.create_index('ix_contents_username_timestamp_id', 'contents', ['username', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_contents_username_domain_timestamp_id', 'contents', ['username', 'domain', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_contents_tags', 'contents', ['tags'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contents_tags', table_name='contents')
+    op.drop_index('ix_contents_username_domain_timestamp_id', table_name='contents')
+    op.drop_index('ix_contents_username_timestamp_id', table_name='contents')
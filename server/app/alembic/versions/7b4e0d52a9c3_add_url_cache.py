@@ -0,0 +1,42 @@
+"""add shared url metadata cache
+
+Revision ID: 7b4e0d52a9c3
+Revises: 1c2f7a9d4e01
+Create Date: 2025-10-13 09:47:12.204731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b4e0d52a9c3'
+down_revision: Union[str, Sequence[str], None] = '1c2f7a9d4e01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('url_cache',
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('domain', sa.String(), nullable=True),
+    sa.Column('favicon', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('url_description', sa.String(), nullable=True),
+    sa.Column('thumbnail', sa.String(), nullable=True),
+    sa.Column('site_name', sa.String(), nullable=True),
+    sa.Column('etag', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.String(), nullable=True),
+    sa.Column('fetched_at', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('url')
+    )
+    op.create_index(op.f('ix_url_cache_fetched_at'), 'url_cache', ['fetched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_url_cache_fetched_at'), table_name='url_cache')
+    op.drop_table('url_cache')
@@ -0,0 +1,38 @@
+"""add pgvector embedding
+
+Revision ID: 9e4a1b7c3d20
+Revises: c81d3f6b2e57
+Create Date: 2025-10-14 10:05:12.418337
+
+Only applied with VECTOR_STORE=pgvector: other installs may not have the
+vector extension available. Switching an existing install later is done with
+``python -m app.cli backfill-vectors``, which runs the same DDL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.pgvector import schema_statements, use_pgvector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a1b7c3d20'
+down_revision: Union[str, Sequence[str], None] = 'c81d3f6b2e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not use_pgvector():
+        return
+    for statement in schema_statements():
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_contents_search_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_contents_embedding_hnsw")
+    op.execute("ALTER TABLE contents DROP COLUMN IF EXISTS embedding")
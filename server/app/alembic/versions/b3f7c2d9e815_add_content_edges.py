@@ -0,0 +1,60 @@
+"""add content edges
+
+Revision ID: b3f7c2d9e815
+Revises: 4d8e2f6a1b93
+Create Date: 2025-10-15 15:12:08.774150
+
+Moves connections from contents.children_ids into content_edges. Duplicate,
+self-referencing and dangling ids in the arrays are dropped on the way.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7c2d9e815'
+down_revision: Union[str, Sequence[str], None] = '4d8e2f6a1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('content_edges',
+    sa.Column('parent_id', sa.String(), nullable=False),
+    sa.Column('child_id', sa.String(), nullable=False),
+    sa.Column('timestamp', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['contents.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['child_id'], ['contents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('parent_id', 'child_id')
+    )
+    op.create_index('ix_content_edges_child_id_parent_id', 'content_edges', ['child_id', 'parent_id'], unique=False)
+    op.execute("""
+        INSERT INTO content_edges (parent_id, child_id, timestamp)
+        SELECT DISTINCT parent.id, child.id, coalesce(parent.timestamp, 0)
+        FROM contents parent
+        CROSS JOIN LATERAL unnest(parent.children_ids) AS linked(child_id)
+        JOIN contents child ON child.id = linked.child_id
+        WHERE child.id <> parent.id
+        ON CONFLICT DO NOTHING
+    """)
+    op.drop_column('contents', 'children_ids')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('contents', sa.Column('children_ids', postgresql.ARRAY(sa.String()), nullable=True))
+    op.execute("""
+        UPDATE contents SET children_ids = edges.children
+        FROM (
+            SELECT parent_id, array_agg(child_id ORDER BY timestamp, child_id) AS children
+            FROM content_edges GROUP BY parent_id
+        ) edges
+        WHERE contents.id = edges.parent_id
+    """)
+    op.execute("UPDATE contents SET children_ids = '{}' WHERE children_ids IS NULL")
+    op.drop_index('ix_content_edges_child_id_parent_id', table_name='content_edges')
+    op.drop_table('content_edges')
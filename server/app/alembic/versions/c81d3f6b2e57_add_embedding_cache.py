@@ -0,0 +1,35 @@
+"""add embedding cache
+
+Revision ID: c81d3f6b2e57
+Revises: 7b4e0d52a9c3
+Create Date: 2025-10-13 16:20:45.930118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d3f6b2e57'
+down_revision: Union[str, Sequence[str], None] = '7b4e0d52a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('embedding_cache',
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('dims', sa.Integer(), nullable=False),
+    sa.Column('text_hash', sa.String(), nullable=False),
+    sa.Column('vector', sa.LargeBinary(), nullable=True),
+    sa.Column('created_at', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('model', 'dims', 'text_hash')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('embedding_cache')
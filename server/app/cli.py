@@ -0,0 +1,357 @@
+"""Maintenance commands, run from the server directory: python -m app.cli <command>"""
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List
+from sqlalchemy import text, update
+from app.db.pg import SessionLocal
+from app.db import ess
+from app.db.ess import client as es_client, bulk_with_retry, BulkAction, create_index, index_name
+from app.db.pgvector import schema_statements, use_pgvector
+from app.models.models import Content
+from app.schemas.schemas import UrlBase
+from app.utils import ingest, tag_counts, url as url_utils
+
+BATCH_SIZE=500
+
+
+def _owners(content_ids: List[str]) -> Dict[str, str]:
+    db=SessionLocal()
+    try:
+        rows=db.query(Content.id, Content.username).filter(Content.id.in_(content_ids)).all()
+    finally:
+        db.close()
+    return {r.id: r.username for r in rows}
+
+
+def _flush(batch: List[dict]) -> Dict[str, int]:
+    owners=_owners([hit["_id"] for hit in batch])
+    actions: List[BulkAction]=[
+        ({"index": {"_index": index_name, "_id": hit["_id"], "routing": owners[hit["_id"]]}}, {**hit["_source"], "owner": owners[hit["_id"]]})
+        for hit in batch if hit["_id"] in owners
+    ]
+    # write the routed copies first, in their own request: a legacy copy is only removed once its replacement exists
+    failed=bulk_with_retry(actions) if actions else {}
+    for doc_id, reason in failed.items():
+        print(f"  failed {doc_id}: {reason}")
+    orphans=[hit["_id"] for hit in batch if hit["_id"] not in owners]
+    moved=[hit["_id"] for hit in batch if hit["_id"] in owners and hit["_id"] not in failed]
+    if moved or orphans:
+        # the legacy copy is the one without owner; when it shares a shard with the routed copy
+        # (always with a single shard) the index call already overwrote it and nothing matches
+        es_client.indices.refresh(index=index_name)
+        es_client.delete_by_query(
+            index=index_name,
+            body={"query": {"bool": {
+                "filter": [{"ids": {"values": moved + orphans}}],
+                "must_not": [{"exists": {"field": "owner"}}],
+            }}},
+            conflicts="proceed",
+            refresh=True,
+        )
+    return {"moved": len(moved), "orphans": len(orphans), "failed": len(failed)}
+
+
+def backfill_owner(args) -> None:
+    """Add owner to documents indexed before owner routing and move them onto their owner's shard.
+
+    Vectors are copied from the existing documents, nothing is re-embedded.
+    Documents whose content row no longer exists are deleted.
+    """
+    if use_pgvector():
+        raise SystemExit("backfill-owner only applies to VECTOR_STORE=opensearch")
+    create_index()
+    totals={"moved": 0, "orphans": 0, "failed": 0}
+    batch: List[dict]=[]
+    query={"query": {"bool": {"must_not": {"exists": {"field": "owner"}}}}}
+    # scanning while rewriting is safe: the scroll works on a snapshot of the index
+    for hit in es_client.scan(index_name, query=query, size=args.batch_size):
+        batch.append(hit)
+        if len(batch)>=args.batch_size:
+            for key, value in _flush(batch).items():
+                totals[key]+=value
+            batch=[]
+            print(f"backfilled {totals['moved']} documents")
+    if batch:
+        for key, value in _flush(batch).items():
+            totals[key]+=value
+    print(f"done: {totals['moved']} moved, {totals['orphans']} orphans deleted, {totals['failed']} failed")
+
+
+def backfill_vectors(args) -> None:
+    """Create the pgvector column and indexes if needed and embed every row that has no vector yet.
+
+    Texts are built exactly like at ingestion, so the embedding cache answers
+    most of them without calling the provider.
+    """
+    if not use_pgvector():
+        raise SystemExit("set VECTOR_STORE=pgvector first")
+    db=SessionLocal()
+    try:
+        for statement in schema_statements():
+            db.execute(text(statement))
+        db.commit()
+
+        done=0
+        while True:
+            rows=db.query(Content.id, Content.domain, Content.site_name, Content.title, Content.url_description, Content.description).filter(
+                Content.embedding.is_(None)
+            ).order_by(Content.id).limit(args.batch_size).all()
+            if not rows:
+                break
+            inputs=[
+                ingest._embedding_input(
+                    UrlBase(domain=r.domain or "", site_name=r.site_name or "", title=r.title, url_description=r.url_description),
+                    r.description
+                )
+                for r in rows
+            ]
+            vectors=url_utils.get_embeddings_many(inputs)
+            for row, vector in zip(rows, vectors):
+                db.execute(update(Content).where(Content.id==row.id).values(embedding=vector).execution_options(synchronize_session=False))
+            db.commit()
+            done+=len(rows)
+            print(f"embedded {done} contents")
+    finally:
+        db.close()
+    print("done")
+
+
+def backfill_suggest(args) -> None:
+    """Write the completion inputs (title, site name, domain, tags) onto documents indexed before suggest existed."""
+    if use_pgvector():
+        raise SystemExit("backfill-suggest only applies to VECTOR_STORE=opensearch")
+    create_index()
+    db=SessionLocal()
+    done=failed=0
+    last_id=""
+    try:
+        while True:
+            rows=db.query(Content.id, Content.username, Content.title, Content.site_name, Content.domain, Content.tags).filter(
+                Content.id>last_id, Content.username.isnot(None)
+            ).order_by(Content.id).limit(args.batch_size).all()
+            if not rows:
+                break
+            last_id=rows[-1].id
+            actions: List[BulkAction]=[
+                (
+                    {"update": {"_index": index_name, "_id": r.id, "routing": r.username}},
+                    {"doc": {"suggest": ingest.suggest_field(r.username, r.title, r.site_name, r.domain, r.tags)}}
+                )
+                for r in rows
+            ]
+            errors=bulk_with_retry(actions)
+            for doc_id, reason in errors.items():
+                print(f"  failed {doc_id}: {reason}")
+            failed+=len(errors)
+            done+=len(rows) - len(errors)
+            print(f"updated {done} documents")
+    finally:
+        db.close()
+    print(f"done: {done} updated, {failed} failed (contents not indexed yet show up as failed)")
+
+
+# painless: float -> int8 the same way ess.encode_vector does, and back for the reverse move
+_TO_BYTE="""
+double n = 0; for (def x : ctx._source.embeddings.vector) { n += x * x; } n = Math.sqrt(n); if (n == 0) { n = 1; }
+List out = new ArrayList();
+for (def x : ctx._source.embeddings.vector) { out.add((int) Math.max(-128, Math.min(127, Math.round(x / n * 127)))); }
+ctx._source.embeddings.vector = out;
+"""
+_FROM_BYTE="""
+List out = new ArrayList();
+for (def x : ctx._source.embeddings.vector) { out.add(x / 127.0); }
+ctx._source.embeddings.vector = out;
+"""
+
+
+def _live_indices() -> List[str]:
+    """Concrete indices behind index_name: the alias targets, or the legacy index of that name."""
+    if es_client.indices.exists_alias(name=index_name):
+        return list(es_client.indices.get_alias(name=index_name).keys())
+    return [index_name]
+
+
+def _live_vector_field(index: str) -> Dict[str, Any]:
+    current=es_client.indices.get_mapping(index=index)
+    return ess._vector_field(next(iter(current.values()), {}).get("mappings", {}))
+
+
+def reindex(args) -> None:
+    """Copy the index into a new one built from the current OPENSEARCH_* vector settings and swap the alias.
+
+    Routing is preserved. Vectors are converted in the _reindex script when
+    moving between float and byte storage. Writes that arrive while the copy
+    runs are not carried over, so run it in a quiet window.
+    """
+    if use_pgvector():
+        raise SystemExit("reindex only applies to VECTOR_STORE=opensearch")
+    sources=_live_indices()
+    # the legacy concrete index has to go in the same call that gives its name to the alias
+    legacy=sources==[index_name] and not es_client.indices.exists_alias(name=index_name)
+    if legacy and args.keep_old:
+        raise SystemExit(f"--keep-old is not possible: {index_name} is a concrete index whose name the new alias takes, "
+                         "so it is deleted in the swap. Snapshot it first if you need a copy, then rerun without --keep-old")
+    target=f"{index_name}_{int(time.time())}"
+    source_type=_live_vector_field(sources[0]).get("data_type", "float")
+    target_type="byte" if ess.VECTOR_COMPRESSION=="byte" else "float"
+
+    settings=ess.index_settings()
+    # no replicas and no refreshes while bulk copying; restored afterwards
+    settings["index"].update({"number_of_replicas": 0, "refresh_interval": "-1"})
+    es_client.indices.create(index=target, body={"settings": settings, "mappings": ess.mappings})
+    print(f"created {target}: {ess.knn_method()} data_type={target_type}")
+
+    body: Dict[str, Any]={"source": {"index": sources, "size": args.batch_size}, "dest": {"index": target}}
+    if source_type!=target_type:
+        body["script"]={"lang": "painless", "source": _TO_BYTE if target_type=="byte" else _FROM_BYTE}
+    started=time.perf_counter()
+    result=es_client.reindex(body=body, wait_for_completion=True, request_timeout=args.timeout)
+    print(f"copied {result.get('created', 0)} documents in {time.perf_counter() - started:.1f}s")
+    if result.get("failures"):
+        es_client.indices.delete(index=target)
+        raise SystemExit(f"reindex failed, {target} removed: {result['failures'][:3]}")
+
+    es_client.indices.put_settings(index=target, body={"index": {
+        "number_of_replicas": ess.NUMBER_OF_REPLICAS,
+        "refresh_interval": None,
+    }})
+    es_client.indices.refresh(index=target)
+    source_count=es_client.count(index=",".join(sources))["count"]
+    target_count=es_client.count(index=target)["count"]
+    if source_count!=target_count:
+        es_client.indices.delete(index=target)
+        raise SystemExit(f"document counts differ ({source_count} vs {target_count}), {target} removed")
+
+    if legacy:
+        actions=[{"remove_index": {"index": index_name}}]
+    elif args.keep_old:
+        actions=[{"remove": {"index": old, "alias": index_name}} for old in sources]
+    else:
+        actions=[{"remove_index": {"index": old}} for old in sources]
+    actions.append({"add": {"index": target, "alias": index_name}})
+    es_client.indices.update_aliases(body={"actions": actions})
+    print(f"{index_name} now points at {target}")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered=sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def _memory_per_million(dims: int, m: int, bytes_per_dim: float) -> float:
+    # native HNSW estimate from the k-NN plugin docs: 1.1 * (bytes per vector + 8 * m) per document
+    return 1.1 * (bytes_per_dim * dims + 8 * m) * 1_000_000 / 2 ** 30
+
+
+def knn_report(args) -> None:
+    """Recall@k of the approximate kNN against exact scoring, its latency, and vector memory per 1M documents.
+
+    Query vectors are sampled from indexed documents.
+    """
+    if use_pgvector():
+        raise SystemExit("knn-report only applies to VECTOR_STORE=opensearch")
+    create_index()
+    field=_live_vector_field(_live_indices()[0])
+    method=field.get("method", {})
+    space_type=method.get("space_type", "l2")
+    sample=es_client.search(index_name, body={
+        "size": args.queries,
+        "_source": ["embeddings.vector"],
+        "query": {"function_score": {"random_score": {"seed": 42, "field": "_seq_no"}}},
+    })["hits"]["hits"]
+    if not sample:
+        raise SystemExit("the index is empty")
+
+    recalls: List[float]=[]
+    approx_ms: List[float]=[]
+    exact_ms: List[float]=[]
+    for hit in sample:
+        vector=hit["_source"]["embeddings"]["vector"]
+        started=time.perf_counter()
+        approx=es_client.search(index_name, body={
+            "size": args.k, "_source": False,
+            "query": {"knn": {"embeddings.vector": {"vector": vector, "k": args.k}}},
+        })
+        approx_ms.append((time.perf_counter() - started) * 1000)
+        started=time.perf_counter()
+        exact=es_client.search(index_name, body={
+            "size": args.k, "_source": False,
+            "query": {"script_score": {
+                "query": {"match_all": {}},
+                "script": {"source": "knn_score", "lang": "knn", "params": {
+                    "field": "embeddings.vector", "query_value": vector, "space_type": space_type,
+                }},
+            }},
+        })
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        approx_ids={h["_id"] for h in approx["hits"]["hits"]}
+        exact_ids=[h["_id"] for h in exact["hits"]["hits"]]
+        if exact_ids:
+            recalls.append(len(approx_ids.intersection(exact_ids)) / len(exact_ids))
+
+    documents=es_client.count(index=index_name)["count"]
+    dims=int(field.get("dimension", ess.dims))
+    m=int(method.get("parameters", {}).get("m", 16))
+    encoder=method.get("parameters", {}).get("encoder", {}).get("parameters", {}).get("type")
+    live="byte" if field.get("data_type")=="byte" else (encoder or "float32")
+    print(f"index {index_name}: {documents} documents, dims={dims}, engine={method.get('engine', 'nmslib')}, "
+          f"space={space_type}, m={m}, storage={live}")
+    print(f"recall@{args.k}: {statistics.mean(recalls):.4f} over {len(recalls)} queries")
+    print(f"approximate kNN latency: p50={_percentile(approx_ms, 50):.1f}ms p95={_percentile(approx_ms, 95):.1f}ms")
+    print(f"exact scoring latency:   p50={_percentile(exact_ms, 50):.1f}ms p95={_percentile(exact_ms, 95):.1f}ms")
+    print("estimated vector memory per 1M documents:")
+    float_gb=_memory_per_million(dims, m, 4)
+    for name, bytes_per_dim in (("float32", 4), ("fp16", 2), ("byte", 1)):
+        gb=_memory_per_million(dims, m, bytes_per_dim)
+        print(f"  {name:<8} {gb:6.2f} GiB  (saves {float_gb - gb:5.2f} GiB vs float32)")
+
+
+def repair_tag_counts(args) -> None:
+    """Recompute every tag count from contents.tags (counts saved before incremental updates drifted upward)."""
+    db=SessionLocal()
+    try:
+        report=tag_counts.repair(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+    prefix="would have " if args.dry_run else ""
+    print(f"done: {prefix}fixed {report['fixed']}, added {report['added']}, removed {report['removed']} tags")
+
+
+def main() -> None:
+    parser=argparse.ArgumentParser(prog="python -m app.cli")
+    commands=parser.add_subparsers(dest="command", required=True)
+
+    backfill=commands.add_parser("backfill-owner", help="add owner and routing to documents indexed without them")
+    backfill.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    backfill.set_defaults(func=backfill_owner)
+
+    vectors=commands.add_parser("backfill-vectors", help="VECTOR_STORE=pgvector: add the embedding column and fill it")
+    vectors.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    vectors.set_defaults(func=backfill_vectors)
+
+    suggestions=commands.add_parser("backfill-suggest", help="add autocomplete inputs to documents indexed before /suggest")
+    suggestions.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    suggestions.set_defaults(func=backfill_suggest)
+
+    rebuild=commands.add_parser("reindex", help="rebuild the index with the current OPENSEARCH_* vector settings and swap the alias")
+    rebuild.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    rebuild.add_argument("--timeout", type=int, default=3600, help="seconds to wait for the copy")
+    rebuild.add_argument("--keep-old", action="store_true", help="keep the previous index instead of deleting it (not possible for a pre-alias index)")
+    rebuild.set_defaults(func=reindex)
+
+    report=commands.add_parser("knn-report", help="recall vs latency of the kNN index and memory per 1M documents")
+    report.add_argument("--queries", type=int, default=50)
+    report.add_argument("--k", type=int, default=10)
+    report.set_defaults(func=knn_report)
+
+    repair=commands.add_parser("repair-tag-counts", help="recompute tag counts from the tags saved on contents")
+    repair.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+    repair.set_defaults(func=repair_tag_counts)
+
+    args=parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,26 @@
 from dotenv import load_dotenv
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
 import os
+from app.db.pgvector import use_pgvector
 
 load_dotenv()
 
+# with VECTOR_STORE=pgvector the embeddings live in Postgres and no cluster is needed
+OPENSEARCH_ENABLED = not use_pgvector()
+
 # OpenSearch configuration
 opensearch_url = os.environ.get("OPENSEARCH_URL")
 index_name = os.environ.get("OPENSEARCH_INDEX_NAME") or "memora"
 dims = os.environ.get("EMBEDDING_DIMS")
 
-if dims is None or opensearch_url is None:
+if OPENSEARCH_ENABLED and (dims is None or opensearch_url is None):
     raise Exception("EMBEDDING_DIMS or OPENSEARCH_URL is not set. Set EMBEDDING_DIMS or OPENSEARCH_URL in your environment.")
 
 try:
-    dims = int(dims)
+    dims = int(dims or 768)
 except ValueError:
     raise Exception(f"cannot convert EMBEDDING_DIMS='{dims}' into integer")
 
@@ -20,21 +28,39 @@ except ValueError:
 opensearch_user = os.environ.get("OPENSEARCH_USER")
 opensearch_pass = os.environ.get("OPENSEARCH_PASSWORD")
 
-if not opensearch_user or not opensearch_pass:
+if OPENSEARCH_ENABLED and (not opensearch_user or not opensearch_pass):
     raise Exception("OPENSEARCH_USER and OPENSEARCH_PASSWORD are required for AWS OpenSearch fine-grained access control")
 
 try:
-    from opensearchpy import OpenSearch
+    from opensearchpy import OpenSearch, AsyncOpenSearch, helpers
 except Exception as e:
-    raise Exception("opensearch-py is required. Install with: pip install opensearch-py") from e
+    raise Exception("opensearch-py is required. Install with: pip install opensearch-py[async]") from e
+
+# connections kept open per client, and the default per-request timeout in seconds
+OPENSEARCH_POOL_MAXSIZE = int(os.environ.get("OPENSEARCH_POOL_MAXSIZE", "100"))
+OPENSEARCH_TIMEOUT = float(os.environ.get("OPENSEARCH_TIMEOUT", "10"))
+
+if OPENSEARCH_ENABLED:
+    # Create OpenSearch client for AWS with fine-grained access control
+    _opensearch_client = OpenSearch(
+        hosts=[opensearch_url],
+        http_auth=(opensearch_user, opensearch_pass),
+        use_ssl=True,
+        verify_certs=True,
+        pool_maxsize=OPENSEARCH_POOL_MAXSIZE,
+        timeout=OPENSEARCH_TIMEOUT,
+    )
 
-# Create OpenSearch client for AWS with fine-grained access control
-_opensearch_client = OpenSearch(
-    hosts=[opensearch_url],
-    http_auth=(opensearch_user, opensearch_pass),
-    use_ssl=True,
-    verify_certs=True,
-)
+    # Async client for the request path: aiohttp keeps up to OPENSEARCH_POOL_MAXSIZE
+    # keep-alive connections, so one worker can hold many searches in flight
+    _async_opensearch_client = AsyncOpenSearch(
+        hosts=[opensearch_url],
+        http_auth=(opensearch_user, opensearch_pass),
+        use_ssl=True,
+        verify_certs=True,
+        maxsize=OPENSEARCH_POOL_MAXSIZE,
+        timeout=OPENSEARCH_TIMEOUT,
+    )
 
 
 # Adapter class to make OpenSearch API compatible with contents.py calls
@@ -57,32 +83,335 @@ class OpenSearchAdapter:
         """Pass through delete calls"""
         return self._client.delete(index=index, id=id, **kwargs)
 
+    def delete_by_query(self, index, body, **kwargs):
+        """Pass through delete_by_query calls"""
+        return self._client.delete_by_query(index=index, body=body, **kwargs)
+
+    def bulk(self, body, index=None, **kwargs):
+        """Pass through _bulk calls; body is a list of action/source lines"""
+        return self._client.bulk(body=body, index=index, **kwargs)
+
+    def reindex(self, body, **kwargs):
+        """Pass through _reindex calls"""
+        return self._client.reindex(body=body, **kwargs)
+
+    def count(self, index, body=None, **kwargs):
+        return self._client.count(index=index, body=body, **kwargs)
+
+    def scan(self, index, query=None, **kwargs):
+        """Iterate over every matching hit with the scroll API"""
+        return helpers.scan(self._client, index=index, query=query, **kwargs)
+
+
+class AsyncOpenSearchAdapter:
+    def __init__(self, opensearch_client):
+        self._client = opensearch_client
+
+    async def search(self, index, body=None, **kwargs):
+        """Pass through search calls; accepts request_timeout per call"""
+        return await self._client.search(index=index, body=body, **kwargs)
+
+    async def create_pit(self, index, **kwargs):
+        """Open a point in time; accepts keep_alive and routing"""
+        return await self._client.create_pit(index=index, **kwargs)
+
+    async def delete_pit(self, pit_ids):
+        return await self._client.delete_pit(body={"pit_id": pit_ids})
+
+    async def close(self):
+        await self._client.close()
+
 
 # Export the adapter as 'client' so contents.py can use it unchanged
-client = OpenSearchAdapter(_opensearch_client)
+client = OpenSearchAdapter(_opensearch_client) if OPENSEARCH_ENABLED else None
+async_client = AsyncOpenSearchAdapter(_async_opensearch_client) if OPENSEARCH_ENABLED else None
+
+
+# statuses worth retrying: queue full / node temporarily unavailable
+RETRYABLE_STATUS = (429, 502, 503, 504)
+BULK_MAX_ACTIONS = int(os.environ.get("OPENSEARCH_BULK_MAX_ACTIONS", "500"))
+BULK_FLUSH_INTERVAL = float(os.environ.get("OPENSEARCH_BULK_FLUSH_INTERVAL", "1.0"))
+BULK_MAX_RETRIES = int(os.environ.get("OPENSEARCH_BULK_MAX_RETRIES", "3"))
+# seconds index_and_wait blocks for the flush carrying its document
+BULK_WAIT_TIMEOUT = float(os.environ.get("OPENSEARCH_BULK_WAIT_TIMEOUT", "30"))
+
+# one queued operation: the action line and, for index actions, the document
+BulkAction = Tuple[Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+def bulk_with_retry(actions: List[BulkAction], max_retries: int = BULK_MAX_RETRIES) -> Dict[str, str]:
+    """Send actions through _bulk, retrying the items that failed with a retryable status.
+
+    Returns {doc id: error reason} for the items that still failed. Deleting a
+    document that does not exist is not treated as a failure.
+    """
+    pending = list(actions)
+    failed: Dict[str, str] = {}
+    attempt = 0
+    while pending:
+        body: List[Dict[str, Any]] = []
+        for meta, source in pending:
+            body.append(meta)
+            if source is not None:
+                body.append(source)
+        try:
+            response = client.bulk(body=body)
+        except Exception as e:
+            if attempt >= max_retries:
+                for meta, _ in pending:
+                    failed[_action_id(meta)] = str(e)
+                break
+            attempt += 1
+            time.sleep(min(0.1 * 2 ** attempt, 2.0))
+            continue
+
+        retry: List[BulkAction] = []
+        if response.get("errors"):
+            for (meta, source), item in zip(pending, response.get("items", [])):
+                op_type, result = next(iter(item.items()))
+                status_code = result.get("status", 200)
+                if status_code < 300 or (op_type == "delete" and status_code == 404):
+                    continue
+                if status_code in RETRYABLE_STATUS and attempt < max_retries:
+                    retry.append((meta, source))
+                else:
+                    error = result.get("error")
+                    failed[_action_id(meta)] = str(error.get("reason") if isinstance(error, dict) else error)
+        if retry:
+            attempt += 1
+            time.sleep(min(0.1 * 2 ** attempt, 2.0))
+        pending = retry
+    return failed
+
+
+def _action_id(meta: Dict[str, Any]) -> str:
+    return str(next(iter(meta.values())).get("_id"))
+
+
+class BulkWriter:
+    """Buffers index/update/delete actions and flushes them through _bulk on size or time.
+
+    Writes become asynchronous: callers enqueue and return immediately, a
+    background thread flushes every ``flush_interval`` seconds or as soon as
+    ``max_actions`` are buffered. Failed items are logged and counted;
+    index_and_wait() additionally hands the item's outcome back to the caller.
+    """
+
+    def __init__(self, index: str, max_actions: int = BULK_MAX_ACTIONS, flush_interval: float = BULK_FLUSH_INTERVAL):
+        self.index_name = index
+        self.max_actions = max_actions
+        self.flush_interval = flush_interval
+        self._buffer: List[BulkAction] = []
+        # (doc id, future) of callers blocked in index_and_wait on the buffered actions
+        self._waiters: List[Tuple[str, Future]] = []
+        self._cond = threading.Condition()
+        self._flushing = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {"flushes": 0, "actions": 0, "failed": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0}
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="opensearch-bulk", daemon=True)
+            self._thread.start()
+
+    def _add(self, action: BulkAction, waiter: Optional[Future] = None) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("bulk writer is closed")
+            self._ensure_started()
+            self._buffer.append(action)
+            if waiter is not None:
+                self._waiters.append((_action_id(action[0]), waiter))
+            if len(self._buffer) == 1 or len(self._buffer) >= self.max_actions:
+                self._cond.notify()
+
+    def index(self, id: str, document: Dict[str, Any], **meta: Any) -> None:
+        self._add(({"index": {"_index": self.index_name, "_id": id, **meta}}, document))
+
+    def index_and_wait(self, id: str, document: Dict[str, Any], timeout: float = BULK_WAIT_TIMEOUT, **meta: Any) -> Optional[str]:
+        """Index through the next flush and block until it is done; returns the error reason, None on success."""
+        waiter: Future = Future()
+        self._add(({"index": {"_index": self.index_name, "_id": id, **meta}}, document), waiter)
+        try:
+            return waiter.result(timeout=timeout)
+        except FutureTimeoutError:
+            return f"no bulk result within {timeout}s"
+
+    def update(self, id: str, fields: Dict[str, Any], **meta: Any) -> None:
+        self._add(({"update": {"_index": self.index_name, "_id": id, **meta}}, {"doc": fields}))
+
+    def delete(self, id: str, **meta: Any) -> None:
+        self._add(({"delete": {"_index": self.index_name, "_id": id, **meta}}, None))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._buffer and not self._closed:
+                    self._cond.wait()
+                if self._buffer and len(self._buffer) < self.max_actions and not self._closed:
+                    # give more writes a chance to join this flush
+                    self._cond.wait(timeout=self.flush_interval)
+                if self._closed and not self._buffer:
+                    return
+            self.flush()
+
+    def flush(self) -> Dict[str, str]:
+        """Send everything buffered so far; returns the ids that failed after retries."""
+        with self._flushing:
+            with self._cond:
+                actions, self._buffer = self._buffer, []
+                waiters, self._waiters = self._waiters, []
+            if not actions:
+                return {}
+            started = time.perf_counter()
+            failed: Dict[str, str] = {}
+            for i in range(0, len(actions), self.max_actions):
+                failed.update(bulk_with_retry(actions[i:i + self.max_actions]))
+            elapsed = (time.perf_counter() - started) * 1000
+            self._stats["flushes"] += 1
+            self._stats["actions"] += len(actions)
+            self._stats["failed"] += len(failed)
+            self._stats["last_flush_ms"] = round(elapsed, 2)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed), 2)
+            self._stats["total_flush_ms"] += elapsed
+        for doc_id, waiter in waiters:
+            waiter.set_result(failed.get(doc_id))
+        for doc_id, reason in failed.items():
+            print(f"opensearch bulk error for {doc_id}: {reason}")
+        return failed
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        flushes = self._stats["flushes"]
+        return {
+            "buffered": len(self._buffer),
+            "flushes": flushes,
+            "actions": self._stats["actions"],
+            "failed": self._stats["failed"],
+            "last_flush_ms": self._stats["last_flush_ms"],
+            "max_flush_ms": self._stats["max_flush_ms"],
+            "avg_flush_ms": round(self._stats["total_flush_ms"] / flushes, 2) if flushes else 0,
+        }
+
+# Vector index layout for newly created (or reindexed) indexes. Changing any of these on a
+# live install takes effect through `python -m app.cli reindex`; until then the existing
+# index keeps its layout and documents/queries are encoded to match it.
+KNN_ENGINE = os.environ.get("OPENSEARCH_KNN_ENGINE", "lucene")
+# "none" stores float32, "fp16" uses the faiss scalar quantizer, "byte" stores int8 (lucene or faiss)
+VECTOR_COMPRESSION = os.environ.get("OPENSEARCH_VECTOR_COMPRESSION", "none").lower()
+# byte vectors are compared by angle, so they default to cosine; float ones keep l2
+KNN_SPACE_TYPE = os.environ.get("OPENSEARCH_KNN_SPACE_TYPE") or ("cosinesimil" if VECTOR_COMPRESSION == "byte" else "l2")
+KNN_M = int(os.environ.get("OPENSEARCH_KNN_M", "16"))
+KNN_EF_CONSTRUCTION = int(os.environ.get("OPENSEARCH_KNN_EF_CONSTRUCTION", "100"))
+# query-time beam width, applied as the knn.algo_param.ef_search index setting, which only nmslib
+# and faiss read. It has no effect on lucene indexes: lucene searches with ef_search = k, so raise
+# recall there with VECTOR_OVERSAMPLE (k = size * oversample) instead
+KNN_EF_SEARCH = int(os.environ.get("OPENSEARCH_KNN_EF_SEARCH", "100"))
+NUMBER_OF_SHARDS = int(os.environ.get("OPENSEARCH_SHARDS", "1"))
+NUMBER_OF_REPLICAS = int(os.environ.get("OPENSEARCH_REPLICAS", "0"))
+# engines that apply a knn "filter" before the graph search instead of on the top k afterwards
+FILTERED_KNN_ENGINES = ("lucene", "faiss")
+
+if VECTOR_COMPRESSION not in ("none", "fp16", "byte"):
+    raise Exception(f"unknown OPENSEARCH_VECTOR_COMPRESSION='{VECTOR_COMPRESSION}', expected none, fp16 or byte")
+if VECTOR_COMPRESSION == "fp16" and KNN_ENGINE != "faiss":
+    raise Exception("OPENSEARCH_VECTOR_COMPRESSION=fp16 needs OPENSEARCH_KNN_ENGINE=faiss")
+if VECTOR_COMPRESSION == "byte" and KNN_ENGINE not in ("lucene", "faiss"):
+    raise Exception("OPENSEARCH_VECTOR_COMPRESSION=byte needs OPENSEARCH_KNN_ENGINE=lucene or faiss")
+
+
+def knn_method() -> Dict[str, Any]:
+    parameters: Dict[str, Any] = {"m": KNN_M, "ef_construction": KNN_EF_CONSTRUCTION}
+    if VECTOR_COMPRESSION == "fp16":
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16", "clip": True}}
+    return {"name": "hnsw", "engine": KNN_ENGINE, "space_type": KNN_SPACE_TYPE, "parameters": parameters}
+
+
+def vector_mapping() -> Dict[str, Any]:
+    mapping: Dict[str, Any] = {"type": "knn_vector", "dimension": dims, "method": knn_method()}
+    if VECTOR_COMPRESSION == "byte":
+        mapping["data_type"] = "byte"
+    return mapping
+
+
+def index_settings() -> Dict[str, Any]:
+    settings: Dict[str, Any] = {
+        "knn": True,
+        "number_of_shards": NUMBER_OF_SHARDS,
+        "number_of_replicas": NUMBER_OF_REPLICAS,
+    }
+    if KNN_ENGINE != "lucene":
+        settings["knn.algo_param.ef_search"] = KNN_EF_SEARCH
+    return {"index": settings}
+
 
 # mappings: keep 'embeddings.vector' path because routes/contents.py expects embeddings.vector
+# 'owner' is the username; documents are also routed by it so a user's library lives on one shard
 mappings = {
     "properties": {
         "id": {"type": "keyword"},
+        "owner": {"type": "keyword"},
         "url": {"type": "keyword"},
         "description": {"type": "text"},
         "url_description": {"type": "text"},
         "title": {"type": "text"},
+        # search-as-you-type over title, site name, domain and tags, filtered per user by context
+        "suggest": {
+            "type": "completion",
+            "contexts": [{"name": "owner", "type": "category"}]
+        },
         "embeddings": {
             "properties": {
-                "vector": {"type": "knn_vector", "dimension": dims}
+                "vector": vector_mapping()
             }
         }
     }
 }
 
+# engine and data type of the live index, read from its mapping by create()
+_knn_engine: Optional[str] = None
+_vector_data_type: str = "float"
+
+
+def knn_filter_supported() -> bool:
+    return _knn_engine in FILTERED_KNN_ENGINES
+
+
+def encode_vector(vector: List[float]) -> List[Any]:
+    """Encode an embedding for the live index: int8 for byte indexes, unchanged otherwise.
+
+    Byte vectors are L2-normalised and scaled by 127, so every component fits
+    in [-128, 127] and cosine similarity is preserved.
+    """
+    if _vector_data_type != "byte" or not vector:
+        return vector
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [max(-128, min(127, round(v / norm * 127))) for v in vector]
+
+
+def _vector_field(index_mappings: Dict[str, Any]) -> Dict[str, Any]:
+    return index_mappings.get("properties", {}).get("embeddings", {}).get("properties", {}).get("vector", {})
+
+
+def _vector_engine(index_mappings: Dict[str, Any]) -> str:
+    # indexes created without a method use the plugin default, nmslib on the versions we run
+    return _vector_field(index_mappings).get("method", {}).get("engine", "nmslib")
+
 
 def create() -> None:
     """Create index with KNN mapping suitable for OpenSearch.
 
     This function is idempotent: if the index exists it will attempt to update the mapping.
     """
+    global _knn_engine, _vector_data_type
     if index_name is None:
         raise Exception("OPENSEARCH_INDEX_NAME is not set.")
 
@@ -94,26 +423,34 @@ def create() -> None:
 
     if not exists:
         index_body = {
-            "settings": {
-                "index": {
-                    "knn": True,
-                    "number_of_shards": 1,
-                    "number_of_replicas": 0,
-                }
-            },
+            "settings": index_settings(),
             "mappings": mappings,
         }
         create_response = client.indices.create(index=index_name, body=index_body)
+        _knn_engine = KNN_ENGINE
+        _vector_data_type = "byte" if VECTOR_COMPRESSION == "byte" else "float"
         print("index created:", create_response)
     else:
-        # update mapping (safe on OpenSearch)
-        mapping_response = client.indices.put_mapping(index=index_name, body=mappings)
+        # add the plain fields only: an existing knn_vector's method cannot be changed in place
+        plain = {"properties": {k: v for k, v in mappings["properties"].items() if k != "embeddings"}}
+        mapping_response = client.indices.put_mapping(index=index_name, body=plain)
         print("mapping updated:", mapping_response)
+        current = client.indices.get_mapping(index=index_name)
+        live = next(iter(current.values()), {}).get("mappings", {})
+        _knn_engine = _vector_engine(live)
+        _vector_data_type = _vector_field(live).get("data_type", "float")
 
 
 def create_index() -> None:
+    if not OPENSEARCH_ENABLED:
+        print("VECTOR_STORE=pgvector, no OpenSearch index to create")
+        return
     try:
         create()
     except Exception as e:
         print("Failed to create index:", e)
         raise
+
+
+# shared buffered writer for the content routes and ingestion workers
+bulk_writer = BulkWriter(index_name)
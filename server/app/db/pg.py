@@ -1,6 +1,8 @@
 # db.py
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy_utils import database_exists, create_database
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from dotenv import load_dotenv
@@ -16,6 +18,23 @@ if not database_url:
 # Optional debug logging
 DB_ECHO = os.environ.get("DB_ECHO", "false").lower() == "true"
 
+# Connection pool, per engine and per worker process
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# seconds after which a pooled connection is replaced, below any server/proxy idle timeout
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+# prepared statements cached per asyncpg connection; set 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "500"))
+
+_pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": True,
+}
+
 
 def ensure_database_exists():
     database_url = os.environ.get("DATABASE_URL")
@@ -34,17 +53,40 @@ def ensure_database_exists():
     return engine
 
 # Call this once at app startup
-engine = ensure_database_exists()
+ensure_database_exists().dispose()
+
+# the sync engine serves the ingestion workers, background jobs and the CLI
+engine = create_engine(database_url, echo=DB_ECHO, **_pool_options)
 
 # Session factory
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+
+def async_database_url(url: str) -> tuple[URL, dict]:
+    """The DATABASE_URL for asyncpg, and connect args for the libpq options asyncpg does not take from the URL."""
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    connect_args = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    sslmode = query.pop("sslmode", None)
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+    query["prepared_statement_cache_size"] = str(DB_STATEMENT_CACHE_SIZE)
+    return parsed.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+# the request path runs on the event loop through asyncpg, no threadpool slot per query
+_async_url, _async_connect_args = async_database_url(database_url)
+async_engine = create_async_engine(_async_url, echo=DB_ECHO, connect_args=_async_connect_args, **_pool_options)
+
+# expire_on_commit=False: attributes stay readable after commit without another round trip
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
 # Base class for models
 Base = declarative_base()
 
 
 # Dependency function to use in FastAPI routes
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -61,4 +103,23 @@ def get_db() -> Generator[Session, None, None]:
             detail=f"Database error: {str(e)}"
         )
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async session for the routes: db: AsyncSession = Depends(get_async_db)
+    HTTP errors raised by the route pass through unchanged; anything else rolls back.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except HTTPException:
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
+            )
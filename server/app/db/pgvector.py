@@ -0,0 +1,74 @@
+"""pgvector storage for content embeddings (VECTOR_STORE=pgvector).
+
+Embeddings live in ``contents.embedding`` next to the row, so a content and
+its vector are committed in one transaction and kNN is a single SQL query.
+OpenSearch is not used at all in this mode.
+"""
+from typing import List, Optional
+from dotenv import load_dotenv
+import os
+from sqlalchemy import Float
+from sqlalchemy.types import UserDefinedType
+load_dotenv()
+
+# "opensearch" (default) or "pgvector"
+VECTOR_STORE=os.getenv('VECTOR_STORE','opensearch').lower()
+EMBEDDING_DIMS=int(os.getenv('EMBEDDING_DIMS','768'))
+
+PGVECTOR_HNSW_M=int(os.getenv('PGVECTOR_HNSW_M','16'))
+PGVECTOR_HNSW_EF_CONSTRUCTION=int(os.getenv('PGVECTOR_HNSW_EF_CONSTRUCTION','64'))
+# candidates visited per query; raise it for recall, lower it for latency
+PGVECTOR_EF_SEARCH=int(os.getenv('PGVECTOR_EF_SEARCH','40'))
+
+if VECTOR_STORE not in ("opensearch", "pgvector"):
+    raise Exception(f"unknown VECTOR_STORE='{VECTOR_STORE}', expected opensearch or pgvector")
+
+
+def use_pgvector() -> bool:
+    return VECTOR_STORE=="pgvector"
+
+
+class Vector(UserDefinedType):
+    """The pgvector ``vector(n)`` type, exchanged with the driver in its text form '[1,2,3]'."""
+    cache_ok=True
+
+    def __init__(self, dims: int):
+        self.dims=dims
+
+    def get_col_spec(self, **kw):
+        return f"vector({self.dims})"
+
+    def bind_processor(self, dialect):
+        def process(value: Optional[List[float]]):
+            if value is None:
+                return None
+            return "[" + ",".join(repr(float(v)) for v in value) + "]"
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value: Optional[str]):
+            if value is None:
+                return None
+            return [float(v) for v in value.strip("[]").split(",") if v]
+        return process
+
+    class comparator_factory(UserDefinedType.Comparator):
+        def l2_distance(self, other):
+            return self.op("<->", return_type=Float)(other)
+
+
+# what the lexical search matches on, mirroring the OpenSearch multi_match over description and url
+SEARCH_TSVECTOR="to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(url, ''))"
+
+
+def schema_statements(dims: int=EMBEDDING_DIMS) -> List[str]:
+    """Idempotent DDL for the embedding column, its HNSW index and the full-text index used for lexical search."""
+    return [
+        "CREATE EXTENSION IF NOT EXISTS vector",
+        f"ALTER TABLE contents ADD COLUMN IF NOT EXISTS embedding vector({dims})",
+        "CREATE INDEX IF NOT EXISTS ix_contents_embedding_hnsw ON contents "
+        f"USING hnsw (embedding vector_l2_ops) WITH (m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION})",
+        "CREATE INDEX IF NOT EXISTS ix_contents_search_tsv ON contents "
+        f"USING gin ({SEARCH_TSVECTOR})",
+    ]
+
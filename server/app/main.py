@@ -3,12 +3,13 @@ from fastapi import Depends, FastAPI
 from fastapi.security import OAuth2PasswordBearer
 import os
 from starlette.middleware.sessions import SessionMiddleware
-from app.db.ess import create_index
-from app.db.pg import ensure_database_exists
+from app.db.ess import create_index, bulk_writer, async_client as es_async
+from app.db.pg import ensure_database_exists, async_engine
+from app.utils import ingest, fetcher, embedding
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routes import users,auth,contents,tags
+from .routes import users,auth,contents,tags,metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,9 +28,23 @@ async def lifespan(app: FastAPI):
 		print("Database setup completed")
 	except Exception as e:
 		print(f"Failed to ensure database exists: {e}")
+
+	if ingest.is_queued():
+		try:
+			resumed = ingest.resume_pending()
+			print(f"Re-queued {resumed} pending contents for ingestion")
+		except Exception as e:
+			print(f"Failed to resume pending ingestion: {e}")
 	
 	yield
-	# shutdown tasks (none)
+	# shutdown tasks
+	ingest.shutdown()
+	bulk_writer.close()
+	fetcher.close()
+	embedding.batcher.close()
+	if es_async is not None:
+		await es_async.close()
+	await async_engine.dispose()
 
 
 app = FastAPI(debug=True, lifespan=lifespan)
@@ -54,4 +69,5 @@ app.add_middleware(
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(contents.router)
-app.include_router(tags.router)
\ No newline at end of file
+app.include_router(tags.router)
+app.include_router(metrics.router)
\ No newline at end of file
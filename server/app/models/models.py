@@ -1,11 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, LargeBinary, Index
 from app.db.pg import Base
 import uuid
 from datetime import datetime
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
+from app.db.pgvector import Vector, use_pgvector, EMBEDDING_DIMS
 from sqlalchemy.dialects.postgresql import ARRAY
 
-from sqlalchemy.ext.mutable import MutableList
 from sqlalchemy.dialects.postgresql import ARRAY
 
 class User(Base):
@@ -17,11 +17,19 @@ class User(Base):
     fullname=Column(String, index=True, nullable=True)
     authenticated=Column(Boolean,default=False)
 
-    contents=relationship('Content', back_populates='user', cascade="all, delete-orphan")
+    # contents are removed with set-based SQL (utils/purge.py), never loaded just to be deleted
+    contents=relationship('Content', back_populates='user', cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Content(Base):
     __tablename__='contents'
+    __table_args__=(
+        # keyset pagination of a user's library, newest first, optionally narrowed to one domain
+        Index('ix_contents_username_timestamp_id', 'username', 'timestamp', 'id'),
+        Index('ix_contents_username_domain_timestamp_id', 'username', 'domain', 'timestamp', 'id'),
+        # tags @> ARRAY[...] filters
+        Index('ix_contents_tags', 'tags', postgresql_using='gin'),
+    )
     id=Column(String, primary_key=True, index=True, default=lambda:str(uuid.uuid4()))
     url=Column(String)
 
@@ -37,13 +45,50 @@ class Content(Base):
     timestamp = Column(Integer, default=lambda: int(datetime.now().timestamp()))
     tags = Column(ARRAY(String),default=list)
 
-    children_ids = Column(MutableList.as_mutable(ARRAY(String)), default=[])    
+    status=Column(String, default="ready", server_default="ready")
+    if use_pgvector():
+        # only mapped with VECTOR_STORE=pgvector, the column does not exist otherwise
+        embedding=deferred(Column(Vector(EMBEDDING_DIMS), nullable=True))
 
     username=Column(String, ForeignKey('users.username'))
     user=relationship('User', back_populates='contents')
 
+class ContentEdge(Base):
+    """A connection from a content to one of its children; both ends go away with either content."""
+    __tablename__='content_edges'
+    # the primary key makes each connection unique and serves parent -> children lookups
+    parent_id=Column(String, ForeignKey('contents.id', ondelete='CASCADE'), primary_key=True)
+    child_id=Column(String, ForeignKey('contents.id', ondelete='CASCADE'), primary_key=True)
+    timestamp=Column(Integer, default=lambda: int(datetime.now().timestamp()))
+    __table_args__=(
+        # child -> parents, used by the cascade when a content is deleted
+        Index('ix_content_edges_child_id_parent_id', 'child_id', 'parent_id'),
+    )
+
 class Tag(Base):
     __tablename__='tags'
     id=Column(String, primary_key=True, index=True, default= lambda: str(uuid.uuid4()))
     tagname=Column(String, unique=True, index=True)
-    count=Column(Integer, index=True, default=1)
\ No newline at end of file
+    count=Column(Integer, index=True, default=1)
+
+class UrlCache(Base):
+    __tablename__='url_cache'
+    url=Column(String, primary_key=True)
+    domain=Column(String)
+    favicon=Column(String,nullable=True)
+    title=Column(String,nullable=True)
+    url_description=Column(String,nullable=True)
+    thumbnail=Column(String,nullable=True)
+    site_name=Column(String)
+    etag=Column(String,nullable=True)
+    last_modified=Column(String,nullable=True)
+    fetched_at=Column(Integer, index=True, default=lambda: int(datetime.now().timestamp()))
+
+
+class EmbeddingCache(Base):
+    __tablename__='embedding_cache'
+    model=Column(String, primary_key=True)
+    dims=Column(Integer, primary_key=True)
+    text_hash=Column(String, primary_key=True)
+    vector=Column(LargeBinary)
+    created_at=Column(Integer, default=lambda: int(datetime.now().timestamp()))
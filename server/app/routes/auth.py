@@ -2,7 +2,10 @@ from fastapi import APIRouter, Body, Path, Query, Depends, HTTPException, status
 from typing import Annotated, cast, Optional
 from app.schemas.schemas import UserIn
 from pydantic import BaseModel
-from app.db.pg import get_db,Session
+from app.db.pg import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from app.utils import auth as auth_utils
 from app.models.models import User
 from sqlalchemy.exc import IntegrityError
@@ -18,7 +21,7 @@ load_dotenv()
 router=APIRouter(
     prefix='/api/auth',
     tags=['auth'],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(get_async_db)],
     responses={404: {"description":"not-found"}}
 )
 
@@ -28,9 +31,10 @@ class UserSignIn(BaseModel):
     password: str
 
 @router.post('/signup', status_code=status.HTTP_201_CREATED)
-def signup(user:Annotated[UserIn,Body()], db:Session=Depends(get_db)):
+async def signup(user:Annotated[UserIn,Body()], db:AsyncSession=Depends(get_async_db)):
     try:
-        hashed=auth_utils.get_password_hash(user.password)
+        # bcrypt is CPU bound: keep it off the event loop
+        hashed=await run_in_threadpool(auth_utils.get_password_hash, user.password)
         db_user=User(
             username=user.username,
             password=hashed,
@@ -39,13 +43,13 @@ def signup(user:Annotated[UserIn,Body()], db:Session=Depends(get_db)):
             authenticated=True
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail='username or emai already exists')
     finally:
-        db.close()
+        await db.close()
     token=auth_utils.create_access_token(str(db_user.username))
     return {
             "access_token": token, 
@@ -61,18 +65,18 @@ def signup(user:Annotated[UserIn,Body()], db:Session=Depends(get_db)):
         }
 
 @router.post('/signin',status_code=status.HTTP_200_OK)
-def signin(payload:Annotated[UserSignIn,Body()], db:Session=Depends(get_db)):
+async def signin(payload:Annotated[UserSignIn,Body()], db:AsyncSession=Depends(get_async_db)):
     try:
         q=None
         if payload.username:
-            q=db.query(User).filter(User.username==payload.username).first()
+            q=await db.scalar(select(User).where(User.username==payload.username))
         elif payload.email:
-            q=db.query(User).filter(User.email==payload.email).first()
-        if not q or not auth_utils.verify_password(payload.password, cast(str, q.password)):
+            q=await db.scalar(select(User).where(User.email==payload.email))
+        if not q or not await run_in_threadpool(auth_utils.verify_password, payload.password, cast(str, q.password)):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         token=auth_utils.create_access_token(cast(str,q.username))
     finally:
-        db.close()
+        await db.close()
     return {
             "access_token":token, 
             "token_type":"bearer", 
@@ -118,7 +122,7 @@ async def google_login(request: Request):
     return await client.authorize_redirect(request, redirect_uri)
 
 @router.get('/google/callback', status_code=status.HTTP_201_CREATED)
-async def google_callback(request: Request, db: Session = Depends(get_db)):
+async def google_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
     try:
         client = oauth.create_client('google')
         if client is None:
@@ -156,7 +160,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
         if not email:
             raise HTTPException(status_code=400, detail="Email not found in user info.")
 
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(select(User).where(User.email == email))
         if not user:
             username = f"{email.split('@')[0]}_{random.randint(1000, 9999)}"
             user = User(
@@ -166,8 +170,8 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
                 password=""
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         
         jwt_token = auth_utils.create_access_token(str(user.username))
         
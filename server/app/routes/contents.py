@@ -1,25 +1,46 @@
-from fastapi import APIRouter,Depends,HTTPException,Query,Path,Body, Request, Header, status
+from fastapi import APIRouter,Depends,HTTPException,Query,Path,Body, Request, Response, Header, BackgroundTasks, status
 from fastapi.responses import StreamingResponse
 import json
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 from app.schemas.schemas import ContentBase, ContentInES, Embeddings
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import os
 import jwt
 from dotenv import load_dotenv
 from app.dependency import verify_token
 from app.utils import auth as auth_utils
-from app.db.pg import get_db
-from app.db.ess import client as es_client, index_name
-from sqlalchemy.orm import Session
-from app.models.models import Content, Tag
-from sqlalchemy import update
+from app.db.pg import get_async_db
+from opensearchpy.exceptions import ConnectionTimeout, NotFoundError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Content, ContentEdge
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import delete, select, tuple_
+from datetime import datetime
 from app.utils import url as url_utils
+from app.utils import ingest, bookmarks, purge, search, answer_cache, streams, graph, tag_counts
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from collections import Counter
+from urllib.parse import urlparse
 load_dotenv()
 
 secret_key=os.getenv('JWT_SECRET_KEY','dev-duplicate-secret')
 algorithm="HS256"
 
+BULK_CHUNK_SIZE=int(os.getenv('BULK_CHUNK_SIZE','100'))
+BULK_MAX_ITEMS=int(os.getenv('BULK_MAX_ITEMS','20000'))
+CONTENTS_PAGE_SIZE=int(os.getenv('CONTENTS_PAGE_SIZE','100'))
+CONTENTS_MAX_PAGE_SIZE=int(os.getenv('CONTENTS_MAX_PAGE_SIZE','500'))
+# per-call OpenSearch timeout for searches, in seconds
+SEARCH_TIMEOUT=float(os.getenv('SEARCH_TIMEOUT','5'))
+# minimum kNN score for a document to be used as RAG context; depends on the space type
+RAG_MIN_SCORE=float(os.getenv('RAG_MIN_SCORE','0.8'))
+# suggest is called on every keystroke: keep its timeout well below a full search
+SUGGEST_TIMEOUT=float(os.getenv('SUGGEST_TIMEOUT','1'))
+SUGGEST_MAX_SIZE=20
+# part of the answer cache key: bump it whenever the RAG prompt below changes
+RAG_PROMPT_VERSION="1"
+
 async def extract_username(req:Request, token:Annotated[str,Depends(verify_token)]):
     try:
         payload=auth_utils.decode_access_token(token)
@@ -35,66 +56,49 @@ async def extract_username(req:Request, token:Annotated[str,Depends(verify_token
 router=APIRouter(
     prefix='/api/contents',
     tags=["contents"],
-    dependencies=[Depends(extract_username),Depends(get_db)],
+    dependencies=[Depends(extract_username),Depends(get_async_db)],
     responses={404: {"description":"not found"}}
 )
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def add_content(content:Annotated[ContentBase,Body()], req:Request, db:Session=Depends(get_db)):
+async def add_content(content:Annotated[ContentBase,Body()], req:Request, response:Response, db:AsyncSession=Depends(get_async_db)):
     username=req.state.username
     try:
-        url_content=url_utils.get_url_details(content.url) 
+        domain=urlparse(content.url).netloc
         db_content=Content(
             id=content.id,
             url=content.url,
             description=content.description,
-            domain=url_content.domain,
-            favicon=url_content.favicon,
-            title=url_content.title,
-            url_description=url_content.url_description,
-            thumbnail=url_content.thumbnail,
-            site_name=url_content.site_name,
+            domain=domain,
+            site_name=domain,
             color=content.color,
-            timestamp=int(content.timestamp / 1000) if content.timestamp else None,
+            # never NULL: the listing pages on (timestamp, id)
+            timestamp=int(content.timestamp / 1000) if content.timestamp else int(datetime.now().timestamp()),
             tags=content.tags,
-            username=username
+            username=username,
+            status=ingest.PENDING if ingest.is_queued() else ingest.READY
         )
         db.add(db_content)
 
-        for tag in content.tags:
-            existing_tag=db.query(Tag).filter(Tag.tagname==tag).first()
-            if existing_tag is None:
-                db_tag = Tag(
-                    tagname=tag,
-                    count=1
-                )
-                db.add(db_tag)
-            else:
-                db.execute(
-                    update(Tag)
-                    .where(Tag.tagname == existing_tag.tagname)
-                    .values(count=Tag.count + 1)
-                )
+        for stmt in tag_counts.statements(tag_counts.deltas([], content.tags)):
+            await db.execute(stmt)
 
-        url_obj={
-            "title":url_content.title,
-            "description":f"{url_content.url_description} {content.description}"
-        }
-        embedding_vector=Embeddings(vector=url_utils.get_embeddings(url_obj))
-        es_obj=ContentInES(
-            id=content.id,
-            url=content.url,
-            description=content.description if content.description else url_content.url_description,
-            embeddings=embedding_vector
-        )
-        result=es_client.index(index=f"{index_name if index_name else 'memora'}",id=es_obj.id, document=es_obj.model_dump())
-        db.commit()
-        db.refresh(db_content)
+        if not ingest.is_queued():
+            # page fetch and embedding are blocking calls
+            await run_in_threadpool(ingest.enrich_content, db_content)
+        await db.commit()
+        await db.refresh(db_content)
+        graph.bump(username)
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while adding content")
+
+    if ingest.is_queued():
+        # enrichment (fetch -> embed -> index) happens on the worker pool, poll /{id}/status for completion
+        ingest.enqueue(str(db_content.id))
+        response.status_code=status.HTTP_202_ACCEPTED
     return{
-        "message":"content added",
+        "message":"content accepted" if ingest.is_queued() else "content added",
         "success":True,
         "content":{
             "id":db_content.id,
@@ -103,6 +107,7 @@ def add_content(content:Annotated[ContentBase,Body()], req:Request, db:Session=D
             "color":db_content.color,
             "timestame":content.timestamp,
             "tags":db_content.tags,
+            "status":db_content.status,
             "url_data":{
                 "domain":db_content.domain,
                 "favicon":db_content.favicon,
@@ -112,11 +117,104 @@ def add_content(content:Annotated[ContentBase,Body()], req:Request, db:Session=D
         }
     }
 
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+async def bulk_import(req:Request):
+    username=req.state.username
+    parser=None
+    items=[]
+    try:
+        # parse while the upload streams in; only the parsed items are kept
+        async for chunk in req.stream():
+            if not chunk:
+                continue
+            if parser is None:
+                parser=bookmarks.make_parser(req.headers.get("content-type",""), chunk)
+            items.extend(parser.feed_bytes(chunk))
+            if len(items)>BULK_MAX_ITEMS:
+                raise HTTPException(status_code=413, detail=f"too many items, the limit is {BULK_MAX_ITEMS} per import.")
+        if parser is not None:
+            items.extend(parser.finish())
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("error: ",e)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="could not parse import body.")
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="no bookmarks found in body.")
+
+    async def event_stream():
+        counts=Counter()
+        for start in range(0, len(items), BULK_CHUNK_SIZE):
+            chunk=items[start:start+BULK_CHUNK_SIZE]
+            results=await run_in_threadpool(ingest.ingest_bulk_chunk, chunk, username)
+            graph.bump(username)
+            for offset, result in enumerate(results):
+                counts[result.get("status")]+=1
+                yield json.dumps({"type":"item", "index":start+offset, **result})+"\n"
+            yield json.dumps({"type":"progress", "processed":start+len(chunk), "total":len(items), "results":dict(counts)})+"\n"
+        yield json.dumps({"type":"done", "total":len(items), "results":dict(counts)})+"\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+# only what a content card needs: no embedding, title or url_description
+_LISTING_COLUMNS=(
+    Content.id, Content.url, Content.description, Content.color, Content.timestamp, Content.tags,
+    Content.domain, Content.favicon, Content.thumbnail, Content.site_name,
+)
+
+async def _children_of(db:AsyncSession, content_ids:list):
+    """parent id -> child ids in connection order, from the content_edges primary key."""
+    children={content_id: [] for content_id in content_ids}
+    if not content_ids:
+        return children
+    rows=await db.execute(
+        select(ContentEdge.parent_id, ContentEdge.child_id)
+        .where(ContentEdge.parent_id.in_(content_ids))
+        .order_by(ContentEdge.parent_id, ContentEdge.timestamp, ContentEdge.child_id)
+    )
+    for parent_id, child_id in rows:
+        children[parent_id].append(child_id)
+    return children
+
 @router.get("/",status_code=status.HTTP_200_OK)
-def get_contents(username:Annotated[str,Query()], req:Request, db:Session=Depends(get_db)):
+async def get_contents(
+    username:Annotated[str,Query()],
+    req:Request,
+    limit:Annotated[int,Query(ge=1, le=CONTENTS_MAX_PAGE_SIZE)]=CONTENTS_PAGE_SIZE,
+    cursor:Annotated[Optional[str],Query()]=None,
+    tags:Annotated[Optional[list[str]],Query()]=None,
+    domain:Annotated[Optional[str],Query()]=None,
+    color:Annotated[Optional[str],Query()]=None,
+    db:AsyncSession=Depends(get_async_db)
+):
+    """Newest first, one page at a time; pass next_cursor back as cursor for the following page.
+
+    tags matches contents carrying all of the given tags.
+    """
+    if username!=req.state.username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid username or token.")
+    fp=search.fingerprint(username, sorted(tags or []), domain, color)
+    after=None
+    if cursor:
+        try:
+            after=search.decode_cursor(cursor, required=("ts", "id", "fp"))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+        if after["fp"]!=fp:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor does not match this listing")
     try:
-        if username!=req.state.username:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid username or token.")
+        query=select(*_LISTING_COLUMNS).where(Content.username==username)
+        if tags:
+            query=query.where(Content.tags.contains(tags))
+        if domain:
+            query=query.where(Content.domain==domain)
+        if color:
+            query=query.where(Content.color==color)
+        if after:
+            query=query.where(tuple_(Content.timestamp, Content.id) < (after["ts"], after["id"]))
+        # one extra row tells whether there is a next page
+        rows=(await db.execute(query.order_by(Content.timestamp.desc(), Content.id.desc()).limit(limit + 1))).all()
+        children=await _children_of(db, [c.id for c in rows[:limit]])
         all_contents=[
             {
                 'id': c.id,
@@ -131,66 +229,167 @@ def get_contents(username:Annotated[str,Query()], req:Request, db:Session=Depend
                     "thumbnail":c.thumbnail,
                     "site_name":c.site_name,
                 },
-                "all-children":c.children_ids,
+                "all-children":children[c.id],
             }
-            for c in db.query(Content).filter(Content.username==username).all()
+            for c in rows[:limit]
         ]
     except Exception as e:
         print("error: ", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while getting contents.")
+    next_cursor=None
+    if len(rows)>limit:
+        last=rows[limit - 1]
+        next_cursor=search.encode_cursor({"ts": last.timestamp, "id": last.id, "fp": fp})
     return{
         "contents":all_contents,
+        "next_cursor":next_cursor,
         "message":"all contents fetched successfully.",
         "success":True
     }
 
+def _content_card(content:Content):
+    return {
+        'id': content.id,
+        'url': content.url,
+        'title': content.title,
+        'description': content.description,
+        'color': content.color,
+        'timestamp': content.timestamp,
+        'tags': content.tags,
+        "url_data":{
+            "domain":content.domain,
+            "favicon":content.favicon,
+            "thumbnail":content.thumbnail,
+            "site_name":content.site_name,
+        }
+    }
+
+async def _hydrate_hits(db:AsyncSession, hits:list, username:str):
+    """Attach a content card to each hit with one WHERE id IN (...) query; hits whose row is gone are dropped."""
+    ids=[hit["id"] for hit in hits]
+    if not ids:
+        return []
+    rows=await db.scalars(select(Content).where(Content.id.in_(ids), Content.username==username))
+    cards={c.id: _content_card(c) for c in rows}
+    return [{**hit, "content": cards[hit["id"]]} for hit in hits if hit["id"] in cards]
+
+# declared before /{content_id} so "suggest" is not taken for a content id
+@router.get("/suggest")
+async def suggest_contents(req:Request, q:Annotated[str,Query(min_length=1, max_length=100)], k:Annotated[int,Query(ge=1, le=SUGGEST_MAX_SIZE)]=5):
+    username=req.state.username
+    try:
+        suggestions=await search.suggest(q.strip(), k, username, SUGGEST_TIMEOUT)
+    except ConnectionTimeout:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="suggest timed out")
+    except Exception as e:
+        print('opensearch suggest error:', e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="suggest error")
+    return {
+        "success": True,
+        "message": "suggestions fetched",
+        "suggestions": suggestions
+    }
+
+# declared before /{content_id} so "graph" is not taken for a content id
+@router.get("/graph")
+async def get_graph(
+    req:Request,
+    root:Annotated[Optional[str],Query()]=None,
+    depth:Annotated[int,Query(ge=1, le=graph.GRAPH_MAX_DEPTH)]=2,
+    db:AsyncSession=Depends(get_async_db)
+):
+    """The user's contents as nodes and their connections as [parent, child] edges, in one response.
+
+    With root, only contents within depth connections of it (either direction).
+    """
+    username=req.state.username
+    try:
+        result=await graph.build(db, username, root, depth)
+    except Exception as e:
+        print("error: ",e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while building graph.")
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="content is not in database.")
+    return {
+        "message":"graph fetched",
+        "success":True,
+        **result
+    }
+
 @router.get("/{content_id}")
-def get_content(content_id:Annotated[str,Path()],db:Session=Depends(get_db)):
+async def get_content(content_id:Annotated[str,Path()],db:AsyncSession=Depends(get_async_db)):
     try:
-        content=db.query(Content).filter(Content.id==content_id).first()
+        content=await db.scalar(select(Content).where(Content.id==content_id))
         if content is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="content is not in database.")
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while getting content")
     return{
-        "content":{
-            'id': content.id,
-            'url': content.url,
-            'description': content.description,
-            'color': content.color,
-            'timestamp': content.timestamp,
-            'tags': content.tags,
-            "url_data":{
-                "domain":content.domain,
-                "favicon":content.favicon,
-                "thumbnail":content.thumbnail,
-                "site_name":content.site_name,
-            }
-        },
+        "content":_content_card(content),
         "message":"content fetched",
         "success":True
     }
 
+@router.get("/{content_id}/status")
+async def get_content_status(content_id:Annotated[str,Path()],db:AsyncSession=Depends(get_async_db)):
+    try:
+        content=await db.scalar(select(Content).where(Content.id==content_id))
+        if content is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="content is not in database.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("error: ",e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while getting content status")
+    result={
+        "id":content.id,
+        "status":content.status,
+        "done":content.status in (ingest.READY, ingest.FAILED),
+    }
+    if content.status==ingest.READY:
+        result["url_data"]={
+            "domain":content.domain,
+            "favicon":content.favicon,
+            "thumbnail":content.thumbnail,
+            "site_name":content.site_name,
+        }
+    return{
+        "content":result,
+        "message":"content status fetched",
+        "success":True
+    }
+
 @router.delete("/")
-def delete_contents(username:Annotated[str,Query()],req:Request, db:Session=Depends(get_db)):
+async def delete_contents(username:Annotated[str,Query()],req:Request, response:Response, background_tasks:BackgroundTasks, db:AsyncSession=Depends(get_async_db)):
     try:
         if username!=req.state.username:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="invalid token or username.")
 
-        content_ids = [c.id for c in db.query(Content.id).filter(Content.username == username).all()]
-        es_index = f"{index_name if index_name else 'memora'}"
-        for cid in content_ids:
-            try:
-                es_client.delete(index=es_index, id=cid)
-            except Exception:
-                pass
-        count=db.query(Content).filter(Content.username == username).delete(synchronize_session=False)
+        count=await db.run_sync(purge.count_contents, username)
+        if count>purge.DELETE_BACKGROUND_THRESHOLD:
+            background_tasks.add_task(purge.purge_contents, username)
+            response.status_code=status.HTTP_202_ACCEPTED
+            return{
+                "message":"contents deletion scheduled",
+                "success":True,
+                "count":count
+            }
 
-        db.commit()
+        content_ids=await db.run_sync(purge.delete_user_contents, username)
+        count=len(content_ids)
+        await db.commit()
+        answer_cache.invalidate_owner(username)
+        graph.bump(username)
+    except HTTPException:
+        raise
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while deleting contents.")
+    try:
+        await run_in_threadpool(purge.delete_index_documents, username)
+    except Exception as e:
+        print("opensearch delete error: ",e)
     return{
         "message":"contents deleted",
         "success":True,
@@ -198,34 +397,22 @@ def delete_contents(username:Annotated[str,Query()],req:Request, db:Session=Depe
     }
 
 @router.delete("/{content_id}")
-def delete_content(content_id: Annotated[str,Path()], db:Session=Depends(get_db)):
+async def delete_content(content_id: Annotated[str,Path()], db:AsyncSession=Depends(get_async_db)):
     try:
-        content=db.query(Content).filter(Content.id==content_id).first()
+        content=await db.scalar(select(Content).where(Content.id==content_id))
         if content is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="content is not in database.")
-        
-        parents = db.query(Content).filter(Content.children_ids.any(content_id)).all()
-        for parent in parents:
-            # remove all occurrences of content_id from children_ids (handle None)
-            children_ids_value = parent.children_ids
-            if isinstance(children_ids_value, list):
-                original_children = children_ids_value
-            else:
-                original_children = []
-            filtered = [cid for cid in original_children if str(cid) != str(content_id)]
-            if filtered != original_children:
-                # Ensure assignment is to a plain list, not a SQLAlchemy column/expression
-                setattr(parent, "children_ids", filtered)
-                db.add(parent)
-
-        es_index = f"{index_name if index_name else 'memora'}"
-        try:
-            es_client.delete(index=es_index, id=content_id)
-        except Exception:
-            pass
-        count=db.query(Content).filter(Content.id == content_id).delete()
 
-        db.commit()
+        # its connections in content_edges are removed by the foreign key cascade
+        count=(await db.execute(delete(Content).where(Content.id == content_id))).rowcount
+        for stmt in tag_counts.statements(tag_counts.deltas(content.tags, [])):
+            await db.execute(stmt)
+
+        await db.commit()
+        # only once the row is really gone, or a failed commit would leave it unsearchable
+        ingest.remove_vector(content_id, content.username)
+        answer_cache.invalidate([content_id])
+        graph.bump(content.username)
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while deleting content.")
@@ -236,14 +423,15 @@ def delete_content(content_id: Annotated[str,Path()], db:Session=Depends(get_db)
     }
 
 @router.put('/{content_id}')
-def update_content(content_id: Annotated[str,Path()],new_content:Annotated[ContentBase,Body()], db:Session=Depends(get_db)):
+async def update_content(content_id: Annotated[str,Path()],new_content:Annotated[ContentBase,Body()], db:AsyncSession=Depends(get_async_db)):
     try:
-        db_content=db.query(Content).filter(Content.id==content_id).first()
+        db_content=await db.scalar(select(Content).where(Content.id==content_id))
         if db_content is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="content is not in database")
         updated_content=new_content.model_dump(exclude_unset=True)
 
         original_url = db_content.url
+        original_tags = list(db_content.tags or [])
         for key, value in updated_content.items():
             setattr(db_content, key, value)
 
@@ -251,7 +439,7 @@ def update_content(content_id: Annotated[str,Path()],new_content:Annotated[Conte
         if "url" in updated_content and updated_content.get("url") and updated_content.get("url") != original_url:
             try:
                 url_value = updated_content.get("url") or ""
-                url_content = url_utils.get_url_details(url_value)
+                url_content = await run_in_threadpool(url_utils.get_url_details, url_value)
                 db_content.__setattr__('domain', url_content.domain)
                 db_content.__setattr__('favicon', url_content.favicon)
                 db_content.__setattr__('title', url_content.title)
@@ -269,39 +457,35 @@ def update_content(content_id: Annotated[str,Path()],new_content:Annotated[Conte
                     "title": url_content.title,
                     "description": f"{url_content.url_description} {new_description or ''}".strip()
                 }
-                embedding_vector = Embeddings(vector=url_utils.get_embeddings(url_obj))
+                embedding_vector = Embeddings(vector=await run_in_threadpool(url_utils.get_embeddings, url_obj))
                 es_obj = ContentInES(
                     id=content_id,
+                    owner=db_content.username,
                     url=updated_content.get("url") or "",
                     description=new_description if new_description is not None and new_description != "" else url_content.url_description,
+                    suggest=ingest.suggest_field(str(db_content.username), url_content.title, url_content.site_name, url_content.domain, list(db_content.tags or [])),
                     embeddings=embedding_vector
                 )
-                es_index = f"{index_name if index_name else 'memora'}"
-                try:
-                    es_client.index(index=es_index, id=es_obj.id, document=es_obj.model_dump())
-                except Exception:
-                    pass
-            except Exception:
-                pass
+                # waits for the bulk flush carrying the document
+                await run_in_threadpool(ingest.store_vector, db_content, es_obj)
+            except Exception as e:
+                print("error: ",e)
+                # the index still holds the old url: queue a fresh ingestion of the new one, or flag it failed
+                db_content.__setattr__('status', ingest.PENDING if ingest.is_queued() else ingest.FAILED)
+        elif "tags" in updated_content:
+            ingest.refresh_suggest(db_content)
     
-        for tag in db_content.tags:
-            existing_tag=db.query(Tag).filter(Tag.tagname==tag).first()
-            if existing_tag is None:
-                db_tag = Tag(
-                    tagname=tag,
-                    count=1
-                )
-                db.add(db_tag)
-            else:
-                db.execute(
-                    update(Tag)
-                    .where(Tag.tagname == existing_tag.tagname)
-                    .values(count=Tag.count + 1)
-                )
-        
+        # only tags added or removed by this edit change the counts
+        for stmt in tag_counts.statements(tag_counts.deltas(original_tags, db_content.tags)):
+            await db.execute(stmt)
+
         db.add(db_content)
-        db.commit()
-        db.refresh(db_content)
+        await db.commit()
+        await db.refresh(db_content)
+        answer_cache.invalidate([content_id])
+        graph.bump(db_content.username)
+        if db_content.status == ingest.PENDING:
+            ingest.enqueue(content_id)
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while updating content.")
@@ -325,16 +509,25 @@ def update_content(content_id: Annotated[str,Path()],new_content:Annotated[Conte
     }
 
 @router.post("/connect-to/{content_Id}")
-def connect_content(content_id:Annotated[str,Body()], content_Id=Annotated[str,Path()], db:Session=Depends(get_db)):
+async def connect_content(content_id:Annotated[str,Body()], content_Id=Annotated[str,Path()], db:AsyncSession=Depends(get_async_db)):
     try:
-        child=db.query(Content).filter(Content.id==content_id).first()
-        parent=db.query(Content).filter(Content.id==content_Id).first()
-        if child is None or parent is None:
+        if content_id==content_Id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="a content cannot be connected to itself")
+        owners=dict((await db.execute(select(Content.id, Content.username).where(Content.id.in_([content_id, content_Id])))).all())
+        if len(owners)<2:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="content/s is not in database")
-        
-        parent.children_ids.append(child.id)
-        db.commit()
-        db.refresh(parent)
+
+        # connecting twice is a no-op
+        await db.execute(
+            insert(ContentEdge)
+            .values(parent_id=content_Id, child_id=content_id, timestamp=int(datetime.now().timestamp()))
+            .on_conflict_do_nothing(index_elements=[ContentEdge.parent_id, ContentEdge.child_id])
+        )
+        await db.commit()
+        for owner in set(owners.values()):
+            graph.bump(owner)
+    except HTTPException:
+        raise
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while connecting content.")
@@ -344,12 +537,14 @@ def connect_content(content_id:Annotated[str,Body()], content_Id=Annotated[str,P
     }
 
 @router.get("/get-children/{content_id}")
-def get_children(content_id:Annotated[str,Path()],db:Session=Depends(get_db)):
+async def get_children(content_id:Annotated[str,Path()],db:AsyncSession=Depends(get_async_db)):
     try:
-        content=db.query(Content).filter(Content.id==content_id).first()
+        content=await db.scalar(select(Content.id).where(Content.id==content_id))
         if content is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="content is not in database")
-        all_children=content.children_ids
+        all_children=(await _children_of(db, [content_id]))[content_id]
+    except HTTPException:
+        raise
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while connecting content.")
@@ -361,66 +556,141 @@ def get_children(content_id:Annotated[str,Path()],db:Session=Depends(get_db)):
 
 class SearchContent(BaseModel):
     input:str
-    isVector:bool
+    isVector:bool=False
+    # "lexical" (BM25), "vector" (kNN + streamed answer) or "hybrid" (both, fused); defaults from isVector
+    mode:Optional[Literal["lexical","vector","hybrid"]]=None
+    # page size; defaults to 5 hits, or 2 context documents in vector mode
+    k:Optional[int]=Field(default=None, ge=1, le=100)
+    fusion:Literal["rrf","weighted"]="rrf"
+    lexical_weight:float=Field(default=1.0, ge=0)
+    vector_weight:float=Field(default=1.0, ge=0)
+    rank_constant:Optional[int]=Field(default=None, ge=1)
+    # return full content cards with each hit instead of bare ids
+    hydrate:bool=False
+    # lexical/hybrid: open a point in time and return a next_cursor; pass it back for the next page
+    paginate:bool=False
+    cursor:Optional[str]=None
+
+async def _search_cursor(search_content:SearchContent, username:str, fp:str):
+    """Resolve the point in time for a paginated search: reuse the cursor's or open one."""
+    if search_content.cursor:
+        try:
+            cursor=search.decode_cursor(search_content.cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if cursor["fp"]!=fp:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor does not belong to this search")
+        return cursor["pit"], cursor
+    if search_content.paginate:
+        return await search.open_pit(username), {}
+    return None, {}
 
 @router.post('/search')
-def search_content(search_content:Annotated[SearchContent,Body()]):
-    if search_content.isVector is False:
-        q_text = (search_content.input or "")
-        query = {
-            "size": 5,
-            "query": {
-                "multi_match": {
-                    "query": q_text,
-                    "fields": ["description", "url"]
-                }
-            }
+async def search_content(search_content:Annotated[SearchContent,Body()], req:Request, db:AsyncSession=Depends(get_async_db)):
+    username=req.state.username
+    mode=search_content.mode or ("vector" if search_content.isVector else "lexical")
+    k=search_content.k or 5
+    fp=search.fingerprint(username, mode, search_content.input, k, search_content.fusion, search_content.lexical_weight, search_content.vector_weight, search_content.rank_constant)
+    if mode=="hybrid":
+        try:
+            pit, cursor=await _search_cursor(search_content, username, fp)
+            offset=cursor.get("offset", 0)
+            fused, more=await search.hybrid_search(
+                search_content.input or "",
+                k,
+                username,
+                SEARCH_TIMEOUT,
+                fusion=search_content.fusion,
+                lexical_weight=search_content.lexical_weight,
+                vector_weight=search_content.vector_weight,
+                rank_constant=search_content.rank_constant,
+                offset=offset,
+                pit=pit
+            )
+            next_cursor=search.encode_cursor({"pit": pit, "fp": fp, "offset": offset + k}) if pit and more else None
+            if pit and not more:
+                await search.close_pit(pit)
+        except ConnectionTimeout:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="search timed out")
+        except NotFoundError as e:
+            if search_content.cursor:
+                raise HTTPException(status_code=status.HTTP_410_GONE, detail="search cursor expired")
+            print('opensearch search error:', e)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="search error")
+        except HTTPException:
+            raise
+        except Exception as e:
+            print('opensearch search error:', e)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="search error")
+        if search_content.hydrate:
+            fused=await _hydrate_hits(db, fused, username)
+        return {
+            "success": True,
+            "message": "content fetched",
+            "mode": mode,
+            "fusion": search_content.fusion,
+            "hits_count": len(fused),
+            "hits": fused,
+            "next_cursor": next_cursor
         }
+    if mode=="lexical":
         try:
-            response = es_client.search(index=f"{index_name if index_name else 'memora'}", body=query)
-            hits = response.get('hits', {}).get('hits', [])
-            if(len(hits)>5):
-                top_hits=hits[:5]
+            pit, cursor=await _search_cursor(search_content, username, fp)
+            next_cursor=None
+            if pit:
+                top_hits, after = await search.lexical_page(search_content.input or "", k, username, SEARCH_TIMEOUT, pit, cursor.get("after"))
+                if after:
+                    next_cursor=search.encode_cursor({"pit": pit, "fp": fp, "after": after})
+                else:
+                    await search.close_pit(pit)
             else:
-                top_hits = hits
+                top_hits = await search.lexical_search(search_content.input or "", k, username, SEARCH_TIMEOUT)
             final_hits = [
                 {
-                    "id": hit["_source"]["id"],
+                    "id": hit["id"],
                 }
                 for hit in top_hits
             ]
+            if search_content.hydrate:
+                final_hits = await _hydrate_hits(db, final_hits, username)
             return {
                 "success": True, 
                 "message": "content fetched",
-                "hits_count": len(top_hits), 
-                "hits": final_hits
+                "hits_count": len(final_hits), 
+                "hits": final_hits,
+                "next_cursor": next_cursor
             }
+        except ConnectionTimeout:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="search timed out")
+        except NotFoundError as e:
+            if search_content.cursor:
+                raise HTTPException(status_code=status.HTTP_410_GONE, detail="search cursor expired")
+            print('opensearch search error:', e)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="search error")
+        except HTTPException:
+            raise
         except Exception as e:
             print('opensearch search error:', e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="search error")
     else:
         try:
-            input_embedding = url_utils.get_text_embeddings(search_content.input)
-            query = {
-                "size": 2,
-                "query": {
-                    "knn": {
-                        "embeddings.vector": {
-                            "vector": input_embedding,
-                            "k": 3
-                        }
-                    }
-                },
-                "min_score": 0.8
-            }
-            response = es_client.search(index=f"{index_name if index_name else 'memora'}", body=query)
-            hits = response.get('hits', {}).get('hits', [])
+            input_embedding = await url_utils.aget_text_embeddings(search_content.input)
+            hits = await search.context_hits(
+                input_embedding,
+                search_content.k or 2,
+                username,
+                SEARCH_TIMEOUT,
+                min_score=RAG_MIN_SCORE,
+                source=["id", "description", "url_description", "title"]
+            )
             final_hits = [
                 {
                     "id": hit["_source"]["id"],
                 }
                 for hit in hits
             ]
+            if search_content.hydrate:
+                final_hits = await _hydrate_hits(db, final_hits, username)
 
             contexts = []
             for _h in hits:
@@ -452,26 +722,79 @@ Write clearly, structured, and easy to follow.
 
 Answer:
 """
-            def event_stream():
-                # first send metadata about top hits as a JSON event
-                meta = {"type": "top_hits", "hits": final_hits}
-                yield f"data: {json.dumps(meta)}\n\n"
+            cache_key = answer_cache.make_key(username, search_content.input, [h["_source"]["id"] for h in hits], RAG_PROMPT_VERSION)
+            cached_chunks = answer_cache.get(cache_key, input_embedding)
 
-                # stream LLM chunks
-                try:
-                    for chunk_text in url_utils.generate_string(prompt):
-                        data = {"type": "chunk", "text": chunk_text}
-                        yield f"data: {json.dumps(data)}\n\n"
-                except HTTPException as he:
-                    err = {"type": "error", "detail": he.detail}
-                    yield f"data: {json.dumps(err)}\n\n"
+            # a cached replay is instant, only live generations take a stream slot
+            if cached_chunks is None and not streams.acquire(username):
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="too many answers streaming, wait for one to finish")
+
+            slot_released = False
+
+            def release_slot(completed: bool = False):
+                # runs from the generator's finally and from the response's background task, whichever comes first
+                nonlocal slot_released
+                if cached_chunks is not None or slot_released:
                     return
+                slot_released = True
+                streams.release(username, completed)
 
-                # final done event
-                done = {"type": "done"}
-                yield f"data: {json.dumps(done)}\n\n"
-            
-            return StreamingResponse(event_stream(), media_type="text/event-stream")
+            async def event_stream():
+                completed = False
+                try:
+                    # first send metadata about top hits as a JSON event
+                    meta = {"type": "top_hits", "hits": final_hits}
+                    yield f"data: {json.dumps(meta)}\n\n"
+
+                    # replay a cached answer for the same question over the same contents
+                    if cached_chunks is not None:
+                        for chunk_text in cached_chunks:
+                            data = {"type": "chunk", "text": chunk_text}
+                            yield f"data: {json.dumps(data)}\n\n"
+                        done = {"type": "done", "cached": True}
+                        yield f"data: {json.dumps(done)}\n\n"
+                        return
+
+                    # stream LLM chunks; generation is cancelled when the client goes away
+                    chunks = []
+                    try:
+                        async for chunk_text in streams.with_heartbeats(url_utils.agenerate_string(prompt), req):
+                            if chunk_text is None:
+                                yield streams.HEARTBEAT
+                                continue
+                            chunks.append(chunk_text)
+                            data = {"type": "chunk", "text": chunk_text}
+                            yield f"data: {json.dumps(data)}\n\n"
+                        if await req.is_disconnected():
+                            return
+                        completed = True
+                    except HTTPException as he:
+                        completed = True
+                        err = {"type": "error", "detail": he.detail}
+                        yield f"data: {json.dumps(err)}\n\n"
+                        return
+                    release_slot(completed)
+                    # only complete answers are cached
+                    answer_cache.put(cache_key, chunks, input_embedding)
+
+                    # final done event
+                    done = {"type": "done"}
+                    yield f"data: {json.dumps(done)}\n\n"
+                finally:
+                    release_slot(completed)
+
+            return StreamingResponse(
+                event_stream(),
+                media_type="text/event-stream",
+                # also frees the slot when the body is never iterated or is dropped before the generator starts
+                background=BackgroundTask(release_slot),
+                # proxies such as nginx must not buffer the stream, or heartbeats never reach the client
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        except ConnectionTimeout:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="search timed out")
+        except HTTPException:
+            raise
         except Exception as e:
             print('opensearch search error:', e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="search error")
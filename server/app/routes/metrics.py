@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated
+from dotenv import load_dotenv
+import os
+from app.dependency import verify_token
+from app.utils import auth as auth_utils
+from app.utils import url_cache, embedding_cache, embedding, answer_cache, streams, graph
+from app.db.ess import bulk_writer
+load_dotenv()
+
+# the numbers describe every user's activity on this worker: off unless explicitly enabled
+METRICS_ENABLED=os.getenv('METRICS_ENABLED','false').lower()=="true"
+
+
+def require_metrics_access(token:Annotated[str,Depends(verify_token)]):
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not found")
+    try:
+        payload=auth_utils.decode_access_token(token)
+    except Exception as e:
+        print('error: ',e)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid token")
+    if not payload.get('sub'):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid token")
+
+
+router=APIRouter(
+    prefix='/api/metrics',
+    tags=['metrics'],
+    dependencies=[Depends(require_metrics_access)],
+    responses={404:{"description":"not-found"}}
+)
+
+@router.get('/')
+def get_metrics():
+    try:
+        metrics={
+            "url_cache":url_cache.stats(),
+            "embedding_cache":embedding_cache.stats(),
+            "embedding_batcher":embedding.batcher.stats(),
+            "opensearch_bulk":bulk_writer.stats(),
+            "answer_cache":answer_cache.stats(),
+            "answer_streams":streams.stats(),
+            "graph_cache":graph.stats(),
+        }
+    except Exception as e:
+        print("error: ",e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while collecting metrics.")
+    return{
+        "message":"metrics fetched.",
+        "success":True,
+        "metrics":metrics
+    }
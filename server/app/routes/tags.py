@@ -1,22 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Query, Path,status
 from typing import Annotated,Optional
 from app.schemas.schemas import TagBase
-from app.db.pg import get_db
-from sqlalchemy.orm import Session
+from app.db.pg import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.models import Tag
 from pydantic import BaseModel
 
 router=APIRouter(
     prefix='/api/tags',
     tags=['tags'],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(get_async_db)],
     responses={404:{"description":"not-found"}}
 )
 
 @router.get('/')
-def get_tags(db:Session=Depends(get_db)):
+async def get_tags(db:AsyncSession=Depends(get_async_db)):
     try:
-        all_tags=db.query(Tag).all()
+        all_tags=(await db.scalars(select(Tag))).all()
     except Exception as e:
         print("error: ",e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="server error while getting tags.")
@@ -30,13 +31,13 @@ class Payload(BaseModel):
     tagname:str
 
 @router.post('/search')
-def search_tags(payload:Annotated[Payload,Body()], db: Session = Depends(get_db)):
+async def search_tags(payload:Annotated[Payload,Body()], db: AsyncSession = Depends(get_async_db)):
     try:
         if not payload:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="tagname is required in body")
 
         # case-insensitive substring match
-        matching_tags = db.query(Tag).filter(Tag.tagname.ilike(f"%{payload}%")).all()
+        matching_tags = (await db.scalars(select(Tag).where(Tag.tagname.ilike(f"%{payload.tagname}%")))).all()
     except HTTPException:
         raise
     except Exception as e:
@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body, BackgroundTasks, status
 from typing import Annotated
 from app.schemas.schemas import UserBase
 import random
-from sqlalchemy.orm import Session
-from app.db.pg import get_db
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.db.pg import get_async_db
 from app.models.models import User
 from app.utils import auth as auth_utils
+from app.utils import purge, answer_cache, graph
 from ..dependency import verify_token
 
 router = APIRouter(
     prefix="/api/users",
     tags=["users"],
-    dependencies=[Depends(get_db)],
+    dependencies=[Depends(get_async_db)],
     responses={404: {"description": "not found"}},
 )
 
@@ -26,9 +29,9 @@ def create_username():
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def read_users(db: Session = Depends(get_db)):
+async def read_users(db: AsyncSession = Depends(get_async_db)):
     try:
-        all_users = db.query(User).all()
+        all_users = (await db.scalars(select(User))).all()
         users = [
             {
                 'username': user.username,
@@ -44,7 +47,7 @@ def read_users(db: Session = Depends(get_db)):
     return {"users": users, "message": 'all users retrieved successfully', "success": True}
 
 @router.get("/{username}")
-def read_user(username:Annotated[str,Path(min_length=3, max_length=20)], token:Annotated[str,Depends(verify_token)],db: Session = Depends(get_db)):
+async def read_user(username:Annotated[str,Path(min_length=3, max_length=20)], token:Annotated[str,Depends(verify_token)],db: AsyncSession = Depends(get_async_db)):
     try:
         try:
             auth_token=auth_utils.decode_access_token(token)
@@ -55,14 +58,14 @@ def read_user(username:Annotated[str,Path(min_length=3, max_length=20)], token:A
         if auth_username is None or auth_username!=username:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="invalid token.")
         
-        user_data=db.query(User).filter(User.username==auth_username).first()
+        user_data=await db.scalar(select(User).where(User.username==auth_username))
         if not user_data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
 
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="error while getting user detail.")
     finally:
-        db.close()
+        await db.close()
 
     return{
         "user": {
@@ -76,7 +79,7 @@ def read_user(username:Annotated[str,Path(min_length=3, max_length=20)], token:A
         }
 
 @router.put('/{username}')
-def update_user(username:Annotated[str,Path()], new_user:Annotated[UserBase, Body()], token:Annotated[str, Depends(verify_token)],db: Session = Depends(get_db)):
+async def update_user(username:Annotated[str,Path()], new_user:Annotated[UserBase, Body()], token:Annotated[str, Depends(verify_token)],db: AsyncSession = Depends(get_async_db)):
     try:
         import jwt as _jwt
         try:
@@ -90,7 +93,7 @@ def update_user(username:Annotated[str,Path()], new_user:Annotated[UserBase, Bod
         if auth_username is None or auth_username != username:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid token.")
 
-        user_obj = db.query(User).filter(User.username == auth_username).first()
+        user_obj = await db.scalar(select(User).where(User.username == auth_username))
         if not user_obj:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
 
@@ -101,14 +104,14 @@ def update_user(username:Annotated[str,Path()], new_user:Annotated[UserBase, Bod
             if key not in allowed:
                 continue
             if key == "password":
-                hashed = auth_utils.get_password_hash(val)
+                hashed = await run_in_threadpool(auth_utils.get_password_hash, val)
                 setattr(user_obj, "password", hashed)
             else:
                 setattr(user_obj, key, val)
 
         db.add(user_obj)
-        db.commit()
-        db.refresh(user_obj)
+        await db.commit()
+        await db.refresh(user_obj)
 
         user_data = {
             "username": user_obj.username,
@@ -121,10 +124,10 @@ def update_user(username:Annotated[str,Path()], new_user:Annotated[UserBase, Bod
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="error while updating user.")
     finally:
-        db.close()
+        await db.close()
 
     return {
         "user": user_data,
@@ -135,7 +138,7 @@ def update_user(username:Annotated[str,Path()], new_user:Annotated[UserBase, Bod
     }
 
 @router.delete('/{username}', status_code=status.HTTP_202_ACCEPTED)
-def delete_user(username:Annotated[str,Path()], token:Annotated[str, Depends(verify_token)],db: Session = Depends(get_db)):
+async def delete_user(username:Annotated[str,Path()], token:Annotated[str, Depends(verify_token)], background_tasks:BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     try:
         import jwt as _jwt
         try:
@@ -149,20 +152,36 @@ def delete_user(username:Annotated[str,Path()], token:Annotated[str, Depends(ver
         if auth_username is None or auth_username != username:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid token.")
 
-        user_obj = db.query(User).filter(User.username == auth_username).first()
+        user_obj = await db.scalar(select(User).where(User.username == auth_username))
         if not user_obj:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
 
-        db.delete(user_obj)
-        db.commit()
+        if await db.run_sync(purge.count_contents, auth_username)>purge.DELETE_BACKGROUND_THRESHOLD:
+            background_tasks.add_task(purge.purge_contents, auth_username, True)
+            return {
+                "message":"user deletion scheduled",
+                "success":True
+            }
+
+        # set-based: contents go in one statement instead of being loaded through the ORM cascade
+        await db.run_sync(purge.delete_user_contents, auth_username)
+        await db.execute(delete(User).where(User.username == auth_username))
+        await db.commit()
+        answer_cache.invalidate_owner(auth_username)
+        graph.bump(auth_username)
 
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="error while deleting user.")
     finally:
-        db.close()
+        await db.close()
+
+    try:
+        await run_in_threadpool(purge.delete_index_documents, auth_username)
+    except Exception as e:
+        print("opensearch delete error: ", e)
 
     return {
         "message":"user deleted from database",
@@ -170,26 +189,26 @@ def delete_user(username:Annotated[str,Path()], token:Annotated[str, Depends(ver
     }
 
 @router.post('/create-unuser', status_code=status.HTTP_201_CREATED)
-def create_unauth_user(db: Session = Depends(get_db)):
+async def create_unauth_user(db: AsyncSession = Depends(get_async_db)):
     try:
         username=create_username()
-        found_user=db.query(User).filter(User.username==username).first()
+        found_user=await db.scalar(select(User).where(User.username==username))
         while(found_user and username==found_user.username):
             username=create_username()
-            found_user=db.query(User).filter(User.username==username).first()
+            found_user=await db.scalar(select(User).where(User.username==username))
         unauth_user=User(
             username=username,
             authenticated=False
         )
         db.add(unauth_user)
-        db.commit()
-        db.refresh(unauth_user)
+        await db.commit()
+        await db.refresh(unauth_user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print("error: ", e)
         raise HTTPException(status_code=500, detail='server error while creating user.')
     finally:
-        db.close()
+        await db.close()
     token=auth_utils.create_access_token(str(unauth_user.username))
     return {
         "access-token": token, 
@@ -205,7 +224,7 @@ def create_unauth_user(db: Session = Depends(get_db)):
         }
 
 @router.post('/mark-auth')
-def make_user_authenticated(password:Annotated[str,Body(min_length=8,max_length=20)], username:Annotated[str, Body()], token:Annotated[str,Depends(verify_token)],db: Session = Depends(get_db)):
+async def make_user_authenticated(password:Annotated[str,Body(min_length=8,max_length=20)], username:Annotated[str, Body()], token:Annotated[str,Depends(verify_token)],db: AsyncSession = Depends(get_async_db)):
     try:
         import jwt as _jwt
         try:
@@ -219,17 +238,17 @@ def make_user_authenticated(password:Annotated[str,Body(min_length=8,max_length=
         if auth_username is None or auth_username != username:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid token.")
 
-        user_obj = db.query(User).filter(User.username == auth_username).first()
+        user_obj = await db.scalar(select(User).where(User.username == auth_username))
         if not user_obj:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
 
-        hashed_password=auth_utils.get_password_hash(password)
+        hashed_password=await run_in_threadpool(auth_utils.get_password_hash, password)
         setattr(user_obj, "password", hashed_password)
         setattr(user_obj, "authenticated", True)
 
         db.add(user_obj)
-        db.commit()
-        db.refresh(user_obj)
+        await db.commit()
+        await db.refresh(user_obj)
 
         user_data = {
             "username": user_obj.username,
@@ -242,10 +261,10 @@ def make_user_authenticated(password:Annotated[str,Body(min_length=8,max_length=
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="error while updating user.")
     finally:
-        db.close()
+        await db.close()
 
     return {
         "user": user_data,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr,HttpUrl, field_validator
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class UserBase(BaseModel):
     username:str
@@ -63,8 +63,10 @@ class Embeddings(BaseModel):
 
 class ContentInES(BaseModel):
     id: str
+    owner: Optional[str]=None
     url: str
     description: Optional[str]=None
+    suggest: Optional[Dict[str, Any]]=None
     embeddings: Embeddings
 
 
@@ -0,0 +1,130 @@
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+import math
+import re
+import threading
+import os
+from app.utils.lru import LRUCache
+load_dotenv()
+
+ANSWER_CACHE_TTL=int(os.getenv('ANSWER_CACHE_TTL', str(6 * 60 * 60)))
+ANSWER_CACHE_SIZE=int(os.getenv('ANSWER_CACHE_SIZE','1024'))
+# cosine similarity above which a differently worded question reuses an answer; 0 disables it
+ANSWER_CACHE_SIMILARITY=float(os.getenv('ANSWER_CACHE_SIMILARITY','0'))
+
+# (owner, normalized question, cited content ids in rank order, prompt version)
+AnswerKey=Tuple[str, str, Tuple[str, ...], str]
+# near-duplicate candidates share everything but the question
+_Scope=Tuple[str, Tuple[str, ...], str]
+
+_SPACES=re.compile(r"\s+")
+
+# reentrant: an insert under the lock can evict, and the eviction hook takes the lock again
+_lock=threading.RLock()
+# content id -> keys of the answers that cited it, for invalidation
+_by_content: Dict[str, Set[AnswerKey]]={}
+# scope -> [(question vector, key)] for the near-duplicate lookup
+_vectors: Dict[_Scope, List[Tuple[List[float], AnswerKey]]]={}
+_counters={"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+
+def normalize_question(question: str) -> str:
+    return _SPACES.sub(" ", question).strip().rstrip("?!.").strip().lower()
+
+
+def make_key(owner: str, question: str, content_ids: List[str], prompt_version: str) -> AnswerKey:
+    return (owner, normalize_question(question), tuple(content_ids), prompt_version)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot=sum(x * y for x, y in zip(a, b))
+    norm=math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _unlink(key: AnswerKey) -> None:
+    """Drop key from the side indexes; the answers cache calls it for every evicted or expired entry."""
+    with _lock:
+        _unlink_locked(key)
+
+
+def _unlink_locked(key: AnswerKey) -> None:
+    for content_id in key[2]:
+        keys=_by_content.get(content_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _by_content[content_id]
+    scope=(key[0], key[2], key[3])
+    entries=[e for e in _vectors.get(scope, []) if e[1]!=key]
+    if entries:
+        _vectors[scope]=entries
+    else:
+        _vectors.pop(scope, None)
+
+
+def _forget(key: AnswerKey) -> None:
+    # caller holds _lock
+    _answers.pop(key)
+    _unlink_locked(key)
+
+
+_answers=LRUCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, on_evict=_unlink)
+
+
+def get(key: AnswerKey, vector: Optional[List[float]]=None) -> Optional[List[str]]:
+    """Return the cached chunks for key, or for a near-duplicate question citing the same contents."""
+    chunks=_answers.get(key)
+    if chunks is not None:
+        _counters["exact_hits"]+=1
+        return chunks
+    if ANSWER_CACHE_SIMILARITY>0 and vector:
+        with _lock:
+            candidates=list(_vectors.get((key[0], key[2], key[3]), []))
+        best=max(candidates, key=lambda e: _cosine(vector, e[0]), default=None)
+        if best is not None and _cosine(vector, best[0])>=ANSWER_CACHE_SIMILARITY:
+            chunks=_answers.get(best[1])
+            if chunks is not None:
+                _counters["similar_hits"]+=1
+                return chunks
+    _counters["misses"]+=1
+    return None
+
+
+def put(key: AnswerKey, chunks: List[str], vector: Optional[List[float]]=None) -> None:
+    with _lock:
+        _answers.set(key, list(chunks))
+        for content_id in key[2]:
+            _by_content.setdefault(content_id, set()).add(key)
+        if vector:
+            scope=(key[0], key[2], key[3])
+            entries=[e for e in _vectors.get(scope, []) if e[1]!=key and _answers.get(e[1]) is not None]
+            entries.append((vector, key))
+            _vectors[scope]=entries
+        _counters["stores"]+=1
+
+
+def invalidate(content_ids: List[str]) -> None:
+    """Drop every answer that cited one of these contents."""
+    with _lock:
+        keys={key for cid in content_ids for key in _by_content.get(cid, ())}
+        for key in keys:
+            _forget(key)
+        _counters["invalidations"]+=len(keys)
+
+
+def invalidate_owner(owner: str) -> None:
+    with _lock:
+        keys={key for keys in _by_content.values() for key in keys if key[0]==owner}
+        keys|={key for scope, entries in _vectors.items() if scope[0]==owner for _, key in entries}
+        for key in keys:
+            _forget(key)
+        _counters["invalidations"]+=len(keys)
+
+
+def stats() -> Dict[str, int]:
+    return {
+        **_counters,
+        "size": len(_answers),
+        "evictions": _answers.evictions,
+    }
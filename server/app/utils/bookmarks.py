@@ -0,0 +1,134 @@
+"""Incremental parsers for bulk imports.
+
+Both parsers accept the request body chunk by chunk through ``feed_bytes``
+and hand back the items completed so far (``finish`` flushes the rest), so
+an upload is never held in memory as one string.
+Items are plain dicts with ``url`` and optional ``id``, ``title``,
+``description``, ``tags``, ``color`` and ``timestamp`` (milliseconds).
+"""
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+import codecs
+import json
+
+
+def _split_tags(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return []
+    return [t.strip() for t in raw.split(",") if t.strip()]
+
+
+class NdjsonParser:
+    def __init__(self):
+        self._decoder=codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending=""
+        self.line=0
+
+    def _parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        self.line+=1
+        line=line.strip()
+        if not line:
+            return None
+        try:
+            data=json.loads(line)
+        except ValueError:
+            return {"error": f"invalid json on line {self.line}"}
+        if not isinstance(data, dict):
+            return {"error": f"expected an object on line {self.line}"}
+        tags=data.get("tags")
+        if isinstance(tags, str):
+            data["tags"]=_split_tags(tags)
+        return data
+
+    def feed_bytes(self, chunk: bytes) -> List[Dict[str, Any]]:
+        self._pending+=self._decoder.decode(chunk)
+        *lines, self._pending=self._pending.split("\n")
+        return [item for item in map(self._parse_line, lines) if item is not None]
+
+    def finish(self) -> List[Dict[str, Any]]:
+        tail=self._pending + self._decoder.decode(b"", final=True)
+        self._pending=""
+        item=self._parse_line(tail)
+        return [item] if item is not None else []
+
+
+class BookmarkHtmlParser(HTMLParser):
+    """Netscape bookmark files as exported by browsers, Pocket and Raindrop."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._decoder=codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._ready: List[Dict[str, Any]]=[]
+        self._current: Optional[Dict[str, Any]]=None
+        self._in_anchor=False
+        self._in_dd=False
+        self._text: List[str]=[]
+
+    def _flush(self) -> None:
+        if self._current is not None:
+            if self._in_dd:
+                description=" ".join("".join(self._text).split())
+                self._current["description"]=description or None
+            self._ready.append(self._current)
+        self._current=None
+        self._in_dd=False
+        self._text=[]
+
+    def handle_starttag(self, tag, attrs):
+        if tag=="a":
+            self._flush()
+            a=dict(attrs)
+            href=a.get("href")
+            if not href or not href.startswith(("http://", "https://")):
+                # folders, javascript: bookmarklets, place: queries ...
+                return
+            item: Dict[str, Any]={"url": href, "tags": _split_tags(a.get("tags"))}
+            added=a.get("add_date") or a.get("time_added")
+            if added and added.isdigit():
+                item["timestamp"]=int(added) * 1000
+            self._current=item
+            self._in_anchor=True
+            self._text=[]
+        elif tag=="dd" and self._current is not None:
+            self._in_dd=True
+            self._text=[]
+        elif tag in ("dt", "dl", "h3"):
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag=="a" and self._in_anchor:
+            self._in_anchor=False
+            if self._current is not None:
+                self._current["title"]=" ".join("".join(self._text).split()) or None
+            self._text=[]
+        elif tag=="dl":
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_anchor or self._in_dd:
+            self._text.append(data)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        ready, self._ready=self._ready, []
+        return ready
+
+    def feed_bytes(self, chunk: bytes) -> List[Dict[str, Any]]:
+        self.feed(self._decoder.decode(chunk))
+        return self._take()
+
+    def finish(self) -> List[Dict[str, Any]]:
+        self.feed(self._decoder.decode(b"", final=True))
+        self.close()
+        self._flush()
+        return self._take()
+
+
+def make_parser(content_type: str, first_chunk: bytes):
+    """Pick a parser from the declared content type, sniffing the body when it is ambiguous."""
+    ctype=content_type.split(";")[0].strip().lower()
+    if ctype=="text/html":
+        return BookmarkHtmlParser()
+    if ctype in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json"):
+        return NdjsonParser()
+    return BookmarkHtmlParser() if first_chunk.lstrip().startswith(b"<") else NdjsonParser()
+
@@ -0,0 +1,245 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import hashlib
+import math
+import queue
+import re
+import threading
+import time
+import os
+load_dotenv()
+
+_WORD=re.compile(r"\w+", re.UNICODE)
+
+api_key=os.getenv('GOOGLE_API_KEY','dupicate_api_key')
+
+# "gemini" calls the Gemini API, "local" embeds on CPU with no network access
+EMBEDDING_PROVIDER=os.getenv('EMBEDDING_PROVIDER','gemini').lower()
+EMBEDDING_DIMS=int(os.getenv('EMBEDDING_DIMS','768'))
+
+EMBED_BATCH_SIZE=int(os.getenv('EMBED_BATCH_SIZE','32'))
+EMBED_BATCH_WAIT_MS=float(os.getenv('EMBED_BATCH_WAIT_MS','10'))
+EMBED_MAX_INFLIGHT=int(os.getenv('EMBED_MAX_INFLIGHT','4'))
+
+_client=None
+_client_lock=threading.Lock()
+
+
+def get_client():
+    """One long-lived Gemini client shared by embeddings and generation."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google import genai
+            _client=genai.Client(api_key=api_key)
+    return _client
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into fixed-size vectors; ``model`` and ``dims`` identify the vector space."""
+    model: str=""
+    dims: int=EMBEDDING_DIMS
+    # remote providers benefit from request coalescing, local ones are called directly
+    batched: bool=False
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """One vector of ``dims`` floats per text, in input order."""
+
+
+class GeminiProvider(EmbeddingProvider):
+    model="gemini-embedding-001"
+    batched=True
+
+    def __init__(self, dims: int=EMBEDDING_DIMS):
+        self.dims=dims
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        from google.genai.types import EmbedContentConfig
+        response=get_client().models.embed_content(
+            model=self.model,
+            contents=texts,
+            config=EmbedContentConfig(output_dimensionality=self.dims)
+        )
+        vectors: List[List[float]]=[]
+        for embedding_obj in (response.embeddings or []) if response else []:
+            # Extract the embedding vector from the ContentEmbedding object
+            if hasattr(embedding_obj, "values"):
+                vectors.append(list(embedding_obj.values) if embedding_obj.values is not None else [])
+            elif isinstance(embedding_obj, list):
+                vectors.append(embedding_obj)
+            else:
+                vectors.append([])
+        if len(vectors)!=len(texts):
+            raise ValueError(f"embedding response has {len(vectors)} vectors for {len(texts)} inputs")
+        return vectors
+
+
+class HashingProvider(EmbeddingProvider):
+    """Deterministic, dependency-free embedding via signed feature hashing.
+
+    Word unigrams, word bigrams and character trigrams are hashed into ``dims``
+    buckets and the result is L2-normalised, so lexical overlap turns into
+    cosine similarity. Good enough for offline installs, benchmarks and tests.
+    """
+    model="hashing-v1"
+
+    def __init__(self, dims: int=EMBEDDING_DIMS):
+        self.dims=dims
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words=_WORD.findall(text.lower())
+        features=[(f"w:{w}", 1.0) for w in words]
+        features+=[(f"b:{a} {b}", 0.75) for a, b in zip(words, words[1:])]
+        for w in words:
+            padded=f"<{w}>"
+            features+=[(f"c:{padded[i:i + 3]}", 0.25) for i in range(len(padded) - 2)]
+        return features
+
+    def _embed_one(self, text: str) -> List[float]:
+        vector=[0.0] * self.dims
+        for feature, weight in self._features(text):
+            digest=hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            h=int.from_bytes(digest, "little")
+            sign=1.0 if h & 1 else -1.0
+            vector[(h >> 1) % self.dims]+=sign * weight
+        norm=math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(t) for t in texts]
+
+
+PROVIDERS: Dict[str, Callable[[int], EmbeddingProvider]]={
+    "gemini": GeminiProvider,
+    "local": HashingProvider,
+    "hashing": HashingProvider,
+}
+
+
+def _make_provider(name: str) -> EmbeddingProvider:
+    factory=PROVIDERS.get(name)
+    if factory is None:
+        raise Exception(f"unknown EMBEDDING_PROVIDER='{name}', expected one of: {', '.join(PROVIDERS)}")
+    return factory(EMBEDDING_DIMS)
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into multi-item API calls.
+
+    Callers block on a future while a dispatcher thread waits up to ``max_wait_ms``
+    (or until ``max_batch`` texts are queued), sends one ``embed_batch`` call and
+    fans the vectors back out. Identical texts in a batch are only sent once.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[List[float]]], max_batch: int=EMBED_BATCH_SIZE,
+                 max_wait_ms: float=EMBED_BATCH_WAIT_MS, max_inflight: int=EMBED_MAX_INFLIGHT):
+        self._embed_batch=embed_batch
+        self.max_batch=max_batch
+        self.max_wait=max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]"=queue.Queue()
+        self._pool=ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="embed-batch")
+        self._thread: Optional[threading.Thread]=None
+        self._lock=threading.Lock()
+        self._closed=False
+        self.batches=0
+        self.items=0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread=threading.Thread(target=self._run, name="embed-dispatcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        if self._closed:
+            raise RuntimeError("embedding batcher is closed")
+        self._ensure_started()
+        future: Future=Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        futures=[self.submit(t) for t in texts]
+        return [f.result() for f in futures]
+
+    def _run(self) -> None:
+        while True:
+            item=self._queue.get()
+            if item is None:
+                return
+            batch=[item]
+            deadline=time.monotonic() + self.max_wait
+            while len(batch)<self.max_batch:
+                remaining=deadline - time.monotonic()
+                if remaining<=0:
+                    break
+                try:
+                    nxt=self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._pool.submit(self._dispatch, batch)
+                    return
+                batch.append(nxt)
+            self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[str, Future]]) -> None:
+        unique: Dict[str, int]={}
+        for text, _ in batch:
+            unique.setdefault(text, len(unique))
+        try:
+            vectors=self._embed_batch(list(unique))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        # dispatched from up to EMBED_MAX_INFLIGHT pool threads at once
+        with self._lock:
+            self.batches+=1
+            self.items+=len(batch)
+        for text, future in batch:
+            future.set_result(vectors[unique[text]])
+
+    def close(self) -> None:
+        self._closed=True
+        if self._thread is not None:
+            self._queue.put(None)  # type: ignore[arg-type]
+            self._thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            batches, items=self.batches, self.items
+        return {
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 2) if batches else 0,
+        }
+
+
+provider=_make_provider(EMBEDDING_PROVIDER)
+batcher=EmbeddingBatcher(provider.embed_batch)
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    if provider.batched:
+        return batcher.embed_many(texts)
+    return provider.embed_batch(texts)
+
+
+def embed_text(text: str) -> List[float]:
+    return embed_texts([text])[0]
+
+
+async def aembed_text(text: str) -> List[float]:
+    """Awaitable embed_text: waits on the batcher future instead of parking a worker thread."""
+    if provider.batched:
+        return await asyncio.wrap_future(batcher.submit(text))
+    return (await asyncio.to_thread(provider.embed_batch, [text]))[0]
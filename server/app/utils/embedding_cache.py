@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import hashlib
+import struct
+import os
+from sqlalchemy.dialects.postgresql import insert
+from app.db.pg import SessionLocal
+from app.models.models import EmbeddingCache
+from app.utils.lru import LRUCache
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE=int(os.getenv('EMBEDDING_CACHE_SIZE','4096'))
+
+CacheKey=Tuple[str, int, str]
+
+_memory=LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+_counters={"db_hits": 0, "misses": 0, "stores": 0}
+
+
+def make_key(model: str, dims: int, text: str) -> CacheKey:
+    return (model, dims, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+def pack(vector: List[float]) -> bytes:
+    # little-endian float32, 4 bytes per dimension
+    return struct.pack(f"<{len(vector)}f", *vector)
+
+
+def unpack(blob: bytes) -> List[float]:
+    return list(struct.unpack(f"<{len(blob) // 4}f", blob))
+
+
+def get(key: CacheKey) -> Optional[List[float]]:
+    vector=_memory.get(key)
+    if vector is not None:
+        return vector
+
+    model, dims, text_hash=key
+    db=SessionLocal()
+    try:
+        row=db.query(EmbeddingCache.vector).filter(
+            EmbeddingCache.model==model,
+            EmbeddingCache.dims==dims,
+            EmbeddingCache.text_hash==text_hash,
+        ).first()
+    except Exception as e:
+        print("error: ", e)
+        row=None
+    finally:
+        db.close()
+    if row is None or not row.vector:
+        _counters["misses"]+=1
+        return None
+
+    _counters["db_hits"]+=1
+    vector=unpack(row.vector)
+    _memory.set(key, vector)
+    return vector
+
+
+def put(key: CacheKey, vector: List[float]) -> None:
+    if not vector:
+        return
+    _memory.set(key, vector)
+    model, dims, text_hash=key
+    stmt=insert(EmbeddingCache).values(model=model, dims=dims, text_hash=text_hash, vector=pack(vector))
+    stmt=stmt.on_conflict_do_nothing(index_elements=[EmbeddingCache.model, EmbeddingCache.dims, EmbeddingCache.text_hash])
+    db=SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+        _counters["stores"]+=1
+    except Exception as e:
+        print("error: ", e)
+        db.rollback()
+    finally:
+        db.close()
+
+
+def stats() -> Dict[str, int]:
+    memory=_memory.stats()
+    return {
+        "memory_hits": memory["hits"],
+        "db_hits": _counters["db_hits"],
+        "misses": _counters["misses"],
+        "stores": _counters["stores"],
+        "memory_size": memory["size"],
+    }
@@ -0,0 +1,226 @@
+"""Shared, bounded page fetcher used for URL metadata extraction.
+
+All requests go through one long-lived ``httpx.AsyncClient`` that runs on a
+dedicated event loop thread, so sync callers (routes, ingestion workers) and
+async callers share the same connection pool. Each host gets its own
+concurrency limit, bodies are capped at ``FETCH_MAX_BYTES`` and non-HTML
+responses are never buffered.
+"""
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+import asyncio
+import codecs
+import threading
+import re
+import os
+import httpx
+load_dotenv()
+
+FETCH_MAX_BYTES=int(os.getenv('FETCH_MAX_BYTES', str(512 * 1024)))
+FETCH_PER_HOST_LIMIT=int(os.getenv('FETCH_PER_HOST_LIMIT','4'))
+FETCH_MAX_CONNECTIONS=int(os.getenv('FETCH_MAX_CONNECTIONS','64'))
+FETCH_TIMEOUT=float(os.getenv('FETCH_TIMEOUT','5'))
+# hard wall-clock budget for one fetch including redirects and queueing on the host limit
+FETCH_DEADLINE=float(os.getenv('FETCH_DEADLINE','8'))
+# small remainders are drained so the connection can go back to the pool
+FETCH_DRAIN_BYTES=16 * 1024
+
+USER_AGENT="memora-bot/1.0"
+HTML_TYPES=("text/html", "application/xhtml+xml")
+# declared types that are not trustworthy enough to skip sniffing
+GENERIC_TYPES=("", "application/octet-stream", "binary/octet-stream")
+
+_HEAD_END=re.compile(rb"</head\s*>", re.I)
+_HTML_START=re.compile(rb"^\s*(?:<!--.*?-->\s*)*<(?:!doctype\s+html|html|head|meta|title)", re.I | re.S)
+_CHARSET=re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.I)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int
+    content_type: str
+    is_html: bool
+    body: bytes=b""
+    truncated: bool=False
+    encoding: Optional[str]=None
+    headers: Dict[str, str]=field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(detect_encoding(self.body, self.encoding), errors="replace")
+
+
+ChunkCallback=Callable[[bytes, FetchResult], bool]
+
+
+def detect_encoding(prefix: bytes, declared: Optional[str]=None) -> str:
+    encoding=declared
+    if encoding is None:
+        m=_CHARSET.search(prefix[:4096])
+        encoding=m.group(1).decode("ascii", "ignore") if m else "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding="utf-8"
+    return encoding
+
+
+def sniff_is_html(prefix: bytes) -> bool:
+    if prefix.startswith(b"\xef\xbb\xbf"):
+        prefix=prefix[3:]
+    return bool(_HTML_START.match(prefix[:1024]))
+
+
+_loop: Optional[asyncio.AbstractEventLoop]=None
+_loop_lock=threading.Lock()
+_client: Optional[httpx.AsyncClient]=None
+# host -> [semaphore, fetches holding or waiting for it]; an entry is dropped once its host is idle,
+# so the dict only ever holds the hosts being fetched right now
+_host_limits: Dict[str, List]={}
+
+
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop=asyncio.new_event_loop()
+            thread=threading.Thread(target=loop.run_forever, name="url-fetcher", daemon=True)
+            thread.start()
+            _loop=loop
+    return _loop
+
+
+def _get_client() -> httpx.AsyncClient:
+    # only ever called on the fetcher loop
+    global _client
+    if _client is None:
+        _client=httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"},
+            timeout=httpx.Timeout(FETCH_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=FETCH_MAX_CONNECTIONS,
+            ),
+            follow_redirects=True,
+            max_redirects=5,
+        )
+    return _client
+
+
+@asynccontextmanager
+async def _host_slot(host: str) -> AsyncIterator[None]:
+    # only used on the fetcher loop, so the bookkeeping needs no lock
+    entry=_host_limits.get(host)
+    if entry is None:
+        entry=[asyncio.Semaphore(FETCH_PER_HOST_LIMIT), 0]
+        _host_limits[host]=entry
+    entry[1]+=1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1]-=1
+        if entry[1]==0 and _host_limits.get(host) is entry:
+            del _host_limits[host]
+
+
+def _short_remainder(resp: httpx.Response) -> bool:
+    # draining a short remainder lets the connection go back to the pool instead of being dropped
+    length=resp.headers.get("content-length")
+    if not length or not length.isdigit():
+        return False
+    return int(length) - resp.num_bytes_downloaded<=FETCH_DRAIN_BYTES
+
+
+async def _fetch(url: str, headers: Optional[Dict[str, str]], on_chunk: Optional[ChunkCallback]) -> FetchResult:
+    host=urlparse(url).netloc.lower()
+    async with _host_slot(host):
+        async with _get_client().stream("GET", url, headers=headers) as resp:
+            if resp.status_code!=304:
+                resp.raise_for_status()
+            ctype=resp.headers.get("content-type", "").split(";")[0].strip().lower()
+            result=FetchResult(
+                url=str(resp.url),
+                status_code=resp.status_code,
+                content_type=ctype,
+                is_html=ctype in HTML_TYPES,
+                encoding=resp.charset_encoding,
+                headers=dict(resp.headers),
+            )
+            if resp.status_code==304:
+                return result
+            if not result.is_html and ctype not in GENERIC_TYPES:
+                # pdf, images, json, plain text ... nothing to extract, don't read the body
+                return result
+
+            buf=bytearray()
+            received=0
+            done=False
+            async for chunk in resp.aiter_bytes():
+                if done:
+                    continue
+                if not result.is_html:
+                    # untyped response, decide from the first bytes
+                    if not sniff_is_html(chunk):
+                        return result
+                    result.is_html=True
+                if received + len(chunk)>=FETCH_MAX_BYTES:
+                    chunk=chunk[:FETCH_MAX_BYTES - received]
+                    done=True
+                received+=len(chunk)
+                if on_chunk is not None:
+                    # streaming consumer, the body is not buffered here
+                    if on_chunk(chunk, result):
+                        done=True
+                else:
+                    scan_from=max(0, len(buf) - 8)
+                    buf.extend(chunk)
+                    if _HEAD_END.search(buf, scan_from):
+                        done=True
+                if done:
+                    result.truncated=True
+                    if not _short_remainder(resp):
+                        break
+            result.body=bytes(buf)
+            return result
+
+
+async def _fetch_with_deadline(url: str, headers: Optional[Dict[str, str]], on_chunk: Optional[ChunkCallback]) -> FetchResult:
+    return await asyncio.wait_for(_fetch(url, headers, on_chunk), timeout=FETCH_DEADLINE)
+
+
+def fetch(url: str, headers: Optional[Dict[str, str]]=None, on_chunk: Optional[ChunkCallback]=None) -> FetchResult:
+    """Blocking fetch for sync callers; raises on network errors and non-2xx/304 responses.
+
+    Without ``on_chunk`` the body is buffered up to the end of ``<head>``. With it, every
+    HTML chunk is handed to the callback (on the fetcher loop) and reading stops as soon
+    as the callback returns True.
+    """
+    future=asyncio.run_coroutine_threadsafe(_fetch_with_deadline(url, headers, on_chunk), _ensure_loop())
+    return future.result()
+
+
+async def afetch(url: str, headers: Optional[Dict[str, str]]=None, on_chunk: Optional[ChunkCallback]=None) -> FetchResult:
+    """Awaitable fetch usable from any event loop; the request itself runs on the fetcher loop."""
+    future=asyncio.run_coroutine_threadsafe(_fetch_with_deadline(url, headers, on_chunk), _ensure_loop())
+    return await asyncio.wrap_future(future)
+
+
+def close() -> None:
+    global _client, _loop
+    if _loop is None:
+        return
+    if _client is not None:
+        client=_client
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), _loop).result(timeout=5)
+        except Exception as e:
+            print("error: ", e)
+        _client=None
+    _loop.call_soon_threadsafe(_loop.stop)
+    _loop=None
+    _host_limits.clear()
@@ -0,0 +1,115 @@
+"""Nodes and edges of a user's content graph, for the graph view.
+
+Results are cached per (owner, graph version). Every write that changes a
+user's contents or connections calls bump(owner), so a cached graph is never
+served after a change made through this process. Other workers only see the
+change once their entry expires (GRAPH_CACHE_TTL).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import threading
+import os
+from sqlalchemy import String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.lru import LRUCache
+load_dotenv()
+
+# larger graphs are cut off (closest nodes first when a root is given) and flagged as truncated
+GRAPH_MAX_NODES=int(os.getenv('GRAPH_MAX_NODES','20000'))
+GRAPH_MAX_DEPTH=int(os.getenv('GRAPH_MAX_DEPTH','6'))
+GRAPH_CACHE_SIZE=int(os.getenv('GRAPH_CACHE_SIZE','32'))
+GRAPH_CACHE_TTL=int(os.getenv('GRAPH_CACHE_TTL','300'))
+# node descriptions are cut to this many characters, the graph only shows a preview
+DESCRIPTION_PREVIEW=200
+
+_NODE_COLUMNS=f"""
+    c.id, c.url, c.title, left(c.description, {DESCRIPTION_PREVIEW}) AS description,
+    c.color, c.timestamp, c.domain, c.site_name, c.favicon
+"""
+
+_LIBRARY=text(f"""
+    SELECT {_NODE_COLUMNS}
+    FROM contents c
+    WHERE c.username = :owner
+    ORDER BY c.timestamp DESC, c.id DESC
+    LIMIT :max_nodes
+""")
+
+# Breadth-first over connections in both directions, within the owner's contents.
+# UNION (not UNION ALL) drops (id, depth) rows that were already produced, and the
+# depth bound ends the walk around cycles, so the work is at most nodes x depth rows.
+_NEIGHBOURHOOD=text(f"""
+    WITH RECURSIVE reach(id, depth) AS (
+        SELECT id, 0 FROM contents WHERE id = :root AND username = :owner
+        UNION
+        SELECT n.id, r.depth + 1
+        FROM reach r
+        JOIN content_edges e ON e.parent_id = r.id OR e.child_id = r.id
+        JOIN contents n ON n.id = CASE WHEN e.parent_id = r.id THEN e.child_id ELSE e.parent_id END
+        WHERE r.depth < :max_depth AND n.username = :owner
+    )
+    SELECT {_NODE_COLUMNS}, min(r.depth) AS depth
+    FROM reach r
+    JOIN contents c ON c.id = r.id
+    GROUP BY c.id
+    ORDER BY depth, c.id
+    LIMIT :max_nodes
+""")
+
+_EDGES=text("""
+    SELECT parent_id, child_id FROM content_edges
+    WHERE parent_id IN (SELECT unnest(:ids)) AND child_id IN (SELECT unnest(:ids))
+    ORDER BY timestamp, parent_id, child_id
+""").bindparams(bindparam("ids", type_=ARRAY(String)))
+
+GraphKey=Tuple[str, int, Optional[str], int]
+
+_graphs=LRUCache(maxsize=GRAPH_CACHE_SIZE, ttl=GRAPH_CACHE_TTL)
+_versions: Dict[str, int]={}
+_lock=threading.Lock()
+
+
+def version(owner: str) -> int:
+    return _versions.get(owner, 0)
+
+
+def bump(owner: Optional[str]) -> None:
+    """Mark owner's graph as changed; called after every committed write to their contents or connections."""
+    if not owner:
+        return
+    with _lock:
+        _versions[owner]=_versions.get(owner, 0) + 1
+
+
+async def build(db: AsyncSession, owner: str, root: Optional[str]=None, depth: int=GRAPH_MAX_DEPTH) -> Optional[Dict[str, Any]]:
+    """{"nodes", "edges", "truncated", "version"} for owner, or None when root is not one of their contents.
+
+    Edges are [parent_id, child_id] pairs between returned nodes. With a root,
+    nodes carry their distance from it as depth.
+    """
+    current=version(owner)
+    key: GraphKey=(owner, current, root, depth if root else 0)
+    cached=_graphs.get(key)
+    if cached is not None:
+        return cached
+
+    params={"owner": owner, "max_nodes": GRAPH_MAX_NODES + 1}
+    if root:
+        rows=(await db.execute(_NEIGHBOURHOOD, {**params, "root": root, "max_depth": depth})).mappings().all()
+        if not rows:
+            return None
+    else:
+        rows=(await db.execute(_LIBRARY, params)).mappings().all()
+    truncated=len(rows)>GRAPH_MAX_NODES
+    nodes: List[Dict[str, Any]]=[dict(row) for row in rows[:GRAPH_MAX_NODES]]
+    ids=[node["id"] for node in nodes]
+    edges=[[parent, child] for parent, child in await db.execute(_EDGES, {"ids": ids})] if ids else []
+
+    graph={"nodes": nodes, "edges": edges, "truncated": truncated, "version": current}
+    _graphs.set(key, graph)
+    return graph
+
+
+def stats() -> Dict[str, int]:
+    return {**_graphs.stats(), "owners": len(_versions)}
@@ -0,0 +1,273 @@
+"""Single-pass, streaming extraction of link-preview metadata.
+
+``MetaExtractor`` is fed raw HTML chunks as they arrive from the fetcher and
+records every meta, link, title and ld+json candidate in one pass. Once
+``</head>`` (or ``<body>``) is seen it tells the fetcher to stop, unless the
+head holds no usable thumbnail, in which case it keeps reading to collect
+body ``<img>`` candidates. Pages without ``</head>`` or ``<body>`` are read to the
+end and every ``<img>`` is a candidate.
+"""
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+import codecs
+import json
+import re
+from app.schemas.schemas import UrlBase
+from app.utils import fetcher
+
+
+class MetaExtractor(HTMLParser):
+    def __init__(self, url: str):
+        super().__init__(convert_charrefs=True)
+        parsed=urlparse(url)
+        self.domain=parsed.netloc
+        self.scheme=parsed.scheme
+        self.base=f"{parsed.scheme}://{parsed.netloc}"
+
+        # first tag wins, like soup.find
+        self.meta_props: Dict[str, Optional[str]]={}
+        self.meta_names: Dict[str, Optional[str]]={}
+        self.links: List[Dict[str, Optional[str]]]=[]
+        self.ld_json: List[str]=[]
+        self.imgs: List[Dict[str, Optional[str]]]=[]
+        self.title: Optional[str]=None
+
+        self.head_done=False
+        self.scanning_body=False
+        self._srcset_hit=False
+        self._in_title=False
+        self._title_parts: List[str]=[]
+        self._in_ld_json=False
+        self._ld_parts: List[str]=[]
+        self._decoder=None
+
+    # -- parser callbacks --
+
+    def handle_starttag(self, tag, attrs):
+        a=dict(attrs)
+        if tag=="meta":
+            prop=a.get("property")
+            if prop is not None and prop not in self.meta_props:
+                self.meta_props[prop]=a.get("content")
+            name=a.get("name")
+            if name is not None and name not in self.meta_names:
+                self.meta_names[name]=a.get("content")
+        elif tag=="link":
+            self.links.append({"rel": a.get("rel"), "href": a.get("href"), "as": a.get("as")})
+        elif tag=="title" and self.title is None:
+            self._in_title=True
+            self._title_parts=[]
+        elif tag=="script" and (a.get("type") or "").strip().lower()=="application/ld+json":
+            self._in_ld_json=True
+            self._ld_parts=[]
+        elif tag=="body":
+            self._end_head()
+        elif tag=="img" and (self.scanning_body or not self.head_done):
+            # images before the end of the head count too: some pages have no <head> or <body> tag at all
+            img={k: a.get(k) for k in ("srcset", "src", "data-src", "width", "height")}
+            self.imgs.append(img)
+            if img["srcset"] and _pick_from_srcset(img["srcset"], self.base):
+                self._srcset_hit=True
+
+    def handle_endtag(self, tag):
+        if tag=="title" and self._in_title:
+            self._in_title=False
+            text="".join(self._title_parts).strip()
+            self.title=text or None
+        elif tag=="script" and self._in_ld_json:
+            self._in_ld_json=False
+            self.ld_json.append("".join(self._ld_parts))
+        elif tag=="head":
+            self._end_head()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        elif self._in_ld_json:
+            self._ld_parts.append(data)
+
+    def _end_head(self):
+        if self.head_done:
+            return
+        self.head_done=True
+        # only walk the body when the head has nothing to offer as a thumbnail
+        self.scanning_body=self._head_thumbnail() is None
+
+    # -- streaming --
+
+    def feed_chunk(self, chunk: bytes, result: "fetcher.FetchResult") -> bool:
+        """Fetcher callback; returns True once enough of the document has been seen."""
+        if self._decoder is None:
+            encoding=fetcher.detect_encoding(chunk, result.encoding)
+            self._decoder=codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.feed(self._decoder.decode(chunk))
+        return self.done
+
+    @property
+    def done(self) -> bool:
+        if not self.head_done:
+            return False
+        # a srcset image always wins the body fallback, so there is nothing left to look for
+        return not self.scanning_body or self._srcset_hit
+
+    def finish(self) -> None:
+        if self._decoder is not None:
+            self.feed(self._decoder.decode(b"", final=True))
+        self.close()
+        if self._in_title:
+            self.handle_endtag("title")
+
+    # -- result --
+
+    def _meta(self, prop: Optional[str]=None, name: Optional[str]=None) -> Optional[str]:
+        if prop:
+            content=self.meta_props.get(prop)
+        elif name:
+            content=self.meta_names.get(name)
+        else:
+            return None
+        return content.strip() if content and isinstance(content, str) else None
+
+    def _valid_image_url(self, u: Optional[str]) -> Optional[str]:
+        return _valid_image_url(u, self.base)
+
+    def _head_thumbnail(self) -> Optional[str]:
+        # 1. Open Graph variants
+        for prop in ("og:image:secure_url", "og:image", "og:image:url"):
+            v=self._valid_image_url(self._meta(prop=prop))
+            if v:
+                return v
+
+        # 2. Twitter cards
+        for name in ("twitter:image:src", "twitter:image"):
+            v=self._valid_image_url(self._meta(name=name))
+            if v:
+                return v
+
+        # 3. JSON-LD (application/ld+json)
+        for raw in self.ld_json:
+            try:
+                data=json.loads(raw or "{}")
+            except Exception:
+                continue
+            # image can be string, dict, or list
+            img=data.get("image") if isinstance(data, dict) else None
+            if isinstance(img, dict):
+                v=self._valid_image_url(img.get("url") or img.get("@id"))
+                if v:
+                    return v
+            if isinstance(img, list) and img:
+                candidate=img[0]
+                if isinstance(candidate, dict):
+                    candidate=candidate.get("url") or candidate.get("@id")
+                v=self._valid_image_url(candidate if isinstance(candidate, str) else None)
+                if v:
+                    return v
+            if isinstance(img, str):
+                v=self._valid_image_url(img)
+                if v:
+                    return v
+
+        # 4. meta itemprop / name
+        v=self._valid_image_url(self._meta(name="image") or self._meta(prop="image"))
+        if v:
+            return v
+
+        # 5. link rel variants
+        for link in self.links:
+            href=link["href"]
+            rel=link["rel"]
+            as_attr=link["as"]
+            if href and rel:
+                rel_values=[r.lower() for r in rel.split()]
+                if any(x in ("image_src", "preload", "icon", "apple-touch-icon", "apple-touch-icon-precomposed") for x in rel_values):
+                    v=self._valid_image_url(href)
+                    if v:
+                        return v
+            if href and as_attr and as_attr.lower()=="image":
+                v=self._valid_image_url(href)
+                if v:
+                    return v
+        return None
+
+    def _body_thumbnail(self) -> Optional[str]:
+        # 6. Images on page: prefer srcset, then the largest declared width x height
+        for img in self.imgs:
+            if img["srcset"]:
+                v=_pick_from_srcset(img["srcset"], self.base)
+                if v:
+                    return v
+
+        best=None
+        best_area=-1
+        for img in self.imgs:
+            src=img["src"] or img["data-src"]
+            if not src:
+                continue
+            area=_to_int(img["width"]) * _to_int(img["height"])
+            if area>best_area:
+                best_area=area
+                best=src
+        if best:
+            return self._valid_image_url(best)
+        return None
+
+    def _favicon(self) -> str:
+        # <link rel="icon" href="..."> or rel="shortcut icon"
+        for link in self.links:
+            rel=link["rel"]
+            if rel and any("icon" in v.lower() for v in rel.split()):
+                if link["href"]:
+                    return urljoin(self.base, link["href"])
+                break
+        return f"{self.scheme}://{self.domain}/favicon.ico" if self.scheme else f"https://{self.domain}/favicon.ico"
+
+    def to_url_base(self) -> UrlBase:
+        return UrlBase(
+            domain=self.domain,
+            favicon=self._favicon(),
+            title=self._meta(prop="og:title") or self.title,
+            url_description=self._meta(prop="og:description") or self._meta(name="description"),
+            thumbnail=self._head_thumbnail() or self._body_thumbnail(),
+            site_name=self._meta(prop="og:site_name") or self.domain,
+        )
+
+
+def _valid_image_url(u: Optional[str], base: str) -> Optional[str]:
+    if not u:
+        return None
+    u=u.strip()
+    if not u:
+        return None
+    if u.startswith("data:") or u.startswith("javascript:"):
+        return None
+    return urljoin(base, u)
+
+
+def _pick_from_srcset(srcset: str, base: str) -> Optional[str]:
+    # pick the candidate with largest width if available, else first
+    candidates=[c.strip() for c in srcset.split(",") if c.strip()]
+    best_url=None
+    best_w=-1
+    for c in candidates:
+        parts=c.split()
+        url_part=parts[0]
+        w=-1
+        if len(parts)>1:
+            m=re.match(r"(\d+)w$", parts[-1])
+            if m:
+                w=int(m.group(1))
+        if w>best_w:
+            best_w=w
+            best_url=url_part
+        elif best_w==-1 and best_url is None:
+            best_url=url_part
+    return _valid_image_url(best_url, base)
+
+
+def _to_int(value: Optional[str]) -> int:
+    try:
+        return int(value) if value is not None else 0
+    except ValueError:
+        return 0
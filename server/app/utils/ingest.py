@@ -0,0 +1,357 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import uuid
+import os
+from sqlalchemy import text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.db.pg import SessionLocal, engine
+from app.db.ess import bulk_writer, bulk_with_retry, BulkAction, encode_vector, index_name
+from app.db.pgvector import use_pgvector
+from app.models.models import Content
+from app.schemas.schemas import ContentInES, Embeddings, UrlBase
+from app.utils import url as url_utils, graph, tag_counts
+load_dotenv()
+
+# "queued" persists the row and enriches it on the worker pool, "sync" keeps the old inline behaviour
+INGESTION_MODE=os.getenv('INGESTION_MODE','queued').lower()
+INGEST_WORKERS=int(os.getenv('INGEST_WORKERS','4'))
+BULK_FETCH_CONCURRENCY=int(os.getenv('BULK_FETCH_CONCURRENCY','16'))
+BULK_DEFAULT_COLOR="#3B82F6"
+
+PENDING="pending"
+PROCESSING="processing"
+READY="ready"
+FAILED="failed"
+
+_executor: Optional[ThreadPoolExecutor]=None
+_bulk_pool: Optional[ThreadPoolExecutor]=None
+
+
+def is_queued() -> bool:
+    return INGESTION_MODE=="queued"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor=ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    return _executor
+
+
+def enrich_content(db_content: Content) -> None:
+    """Fetch the page metadata, embed it and index the content in OpenSearch.
+
+    The row is updated in place; committing is left to the caller.
+    """
+    url_content=url_utils.get_url_details(str(db_content.url))
+    db_content.__setattr__('domain', url_content.domain)
+    db_content.__setattr__('favicon', url_content.favicon)
+    db_content.__setattr__('title', url_content.title)
+    db_content.__setattr__('url_description', url_content.url_description)
+    db_content.__setattr__('thumbnail', url_content.thumbnail)
+    db_content.__setattr__('site_name', url_content.site_name)
+
+    description=db_content.description
+    vector=url_utils.get_embeddings(_embedding_input(url_content, description))
+    es_obj=build_es_document(str(db_content.id), str(db_content.username), str(db_content.url), description, url_content, vector, list(db_content.tags or []))
+    store_vector(db_content, es_obj)
+
+
+def store_vector(db_content: Content, es_obj: ContentInES) -> None:
+    """Write the document to the configured vector store.
+
+    With pgvector the embedding is set on the row and lands in the caller's
+    commit; otherwise it goes out with the next OpenSearch bulk flush and this
+    waits for its result, raising when it was not indexed so the caller never
+    reports the content as ready.
+    """
+    if use_pgvector():
+        db_content.__setattr__('embedding', es_obj.embeddings.vector)
+        return
+    failure=bulk_writer.index_and_wait(es_obj.id, es_document(es_obj), routing=es_obj.owner)
+    if failure is not None:
+        raise RuntimeError(f"indexing {es_obj.id} failed: {failure}")
+
+
+def es_document(es_obj: ContentInES) -> Dict[str, Any]:
+    document=es_obj.model_dump()
+    document["embeddings"]["vector"]=encode_vector(es_obj.embeddings.vector)
+    return document
+
+
+def refresh_suggest(db_content: Content) -> None:
+    """Re-send the suggest inputs of an indexed content after its title or tags changed."""
+    if use_pgvector():
+        # suggestions are read from the row itself
+        return
+    owner=str(db_content.username)
+    fields={"suggest": suggest_field(owner, db_content.title, db_content.site_name, db_content.domain, list(db_content.tags or []))}
+    bulk_writer.update(str(db_content.id), fields, routing=owner)
+
+
+def remove_vector(content_id: str, owner: str) -> None:
+    # pgvector embeddings go away with the row
+    if not use_pgvector():
+        bulk_writer.delete(content_id, routing=owner)
+
+
+def _embedding_input(url_content: UrlBase, description: Optional[str]) -> Dict[str, Any]:
+    return {
+        "title":url_content.title,
+        "description":f"{url_content.url_description} {description}"
+    }
+
+
+def suggest_field(owner: str, title: Optional[str], site_name: Optional[str], domain: Optional[str], tags: Optional[List[str]]) -> Dict[str, Any]:
+    """Completion inputs for the suggest endpoint, tagged with the owner context."""
+    inputs: List[str]=[]
+    for value in [title, site_name, domain, *(tags or [])]:
+        value=(value or "").strip()
+        if value and value not in inputs:
+            inputs.append(value)
+    return {"input": inputs, "contexts": {"owner": [owner]}}
+
+
+def build_es_document(content_id: str, owner: str, url: str, description: Optional[str], url_content: UrlBase, vector: List[float],
+                      tags: Optional[List[str]]=None) -> ContentInES:
+    return ContentInES(
+        id=content_id,
+        owner=owner,
+        url=url,
+        description=description if description else url_content.url_description,
+        suggest=suggest_field(owner, url_content.title, url_content.site_name, url_content.domain, tags),
+        embeddings=Embeddings(vector=vector)
+    )
+
+
+def _claim(db: Session, content_id: str) -> bool:
+    """Move a pending row to processing; False when it is gone or another run already took it."""
+    claimed=db.execute(
+        update(Content).where(Content.id==content_id, Content.status==PENDING)
+        .values(status=PROCESSING).returning(Content.id)
+    ).first()
+    db.commit()
+    return claimed is not None
+
+
+def run_ingestion(content_id: str, claimed: bool=False) -> None:
+    """Worker entry point: enrich a pending content row and record the outcome in its status.
+
+    The row is claimed first, so a content enqueued twice is only ingested once;
+    resume_pending passes claimed=True for rows it already claimed.
+    """
+    db: Session=SessionLocal()
+    try:
+        if not claimed and not _claim(db, content_id):
+            return
+        db_content=db.query(Content).filter(Content.id==content_id).first()
+        if db_content is None:
+            return
+
+        enrich_content(db_content)
+        db_content.__setattr__('status', READY)
+        db.commit()
+        # the graph labels nodes with the title and domain filled in just now
+        graph.bump(db_content.username)
+    except Exception as e:
+        print("ingestion error: ", e)
+        db.rollback()
+        try:
+            db.query(Content).filter(Content.id==content_id).update({"status": FAILED}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            print("error: ", e)
+            db.rollback()
+    finally:
+        db.close()
+
+
+def _get_bulk_pool() -> ThreadPoolExecutor:
+    global _bulk_pool
+    if _bulk_pool is None:
+        _bulk_pool=ThreadPoolExecutor(max_workers=BULK_FETCH_CONCURRENCY, thread_name_prefix="bulk-fetch")
+    return _bulk_pool
+
+
+def _bulk_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate one parsed import item; raises ValueError with a client-facing reason."""
+    if "error" in item:
+        raise ValueError(item["error"])
+    url=item.get("url")
+    if not isinstance(url, str) or not url.strip().startswith(("http://", "https://")):
+        raise ValueError("url must be an absolute http(s) url")
+    tags=item.get("tags") or []
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        raise ValueError("tags must be a list of strings")
+    timestamp=item.get("timestamp")
+    return {
+        "id":str(item.get("id") or uuid.uuid4()),
+        "url":url.strip(),
+        "title":item.get("title") if isinstance(item.get("title"), str) else None,
+        "description":item.get("description") if isinstance(item.get("description"), str) else None,
+        "color":item.get("color") if isinstance(item.get("color"), str) else BULK_DEFAULT_COLOR,
+        "tags":sorted(set(t.strip() for t in tags if t.strip())),
+        "timestamp":int(timestamp / 1000) if isinstance(timestamp, (int, float)) and timestamp>0 else int(datetime.now().timestamp()),
+    }
+
+
+def ingest_bulk_chunk(items: List[Dict[str, Any]], username: str) -> List[Dict[str, Any]]:
+    """Import one chunk of parsed bookmarks and return a result per item, in order.
+
+    Metadata is fetched with bounded parallelism, embeddings are requested in one
+    batch, rows go in with a single multi-row INSERT and documents are indexed
+    with one _bulk call.
+    """
+    results: List[Dict[str, Any]]=[{} for _ in items]
+    valid: List[Tuple[int, Dict[str, Any]]]=[]
+    for pos, item in enumerate(items):
+        try:
+            valid.append((pos, _bulk_item(item)))
+        except ValueError as e:
+            results[pos]={"status":"invalid", "url":item.get("url"), "detail":str(e)}
+
+    fresh: List[Tuple[int, Dict[str, Any]]]=[]
+    db: Session=SessionLocal()
+    try:
+        # skip urls the user already saved, and repeats inside the chunk
+        existing={
+            r.url for r in db.query(Content.url).filter(
+                Content.username==username,
+                Content.url.in_([row["url"] for _, row in valid])
+            ).all()
+        } if valid else set()
+        for pos, row in valid:
+            if row["url"] in existing:
+                results[pos]={"status":"duplicate", "url":row["url"]}
+                continue
+            existing.add(row["url"])
+            fresh.append((pos, row))
+        if not fresh:
+            return results
+
+        details=list(_get_bulk_pool().map(lambda pr: url_utils.get_url_details(pr[1]["url"]), fresh))
+        details=[
+            d if d.title or not row["title"] else d.model_copy(update={"title": row["title"]})
+            for d, (_, row) in zip(details, fresh)
+        ]
+        vectors=url_utils.get_embeddings_many([_embedding_input(d, row["description"]) for d, (_, row) in zip(details, fresh)])
+
+        rows=[
+            {
+                "id":row["id"],
+                "url":row["url"],
+                "description":row["description"],
+                **d.model_dump(),
+                "color":row["color"],
+                "timestamp":row["timestamp"],
+                "tags":row["tags"],
+                "username":username,
+                "status":READY,
+                **({"embedding":vector} if use_pgvector() else {}),
+            }
+            for d, vector, (_, row) in zip(details, vectors, fresh)
+        ]
+        stmt=insert(Content).values(rows).on_conflict_do_nothing(index_elements=[Content.id]).returning(Content.id)
+        inserted=set(db.execute(stmt).scalars().all())
+
+        tag_counts.apply(db, dict(Counter(t for r in rows if r["id"] in inserted for t in r["tags"])))
+
+        actions: List[BulkAction]=[]
+        for d, vector, (_, row) in zip(details, vectors, fresh):
+            if row["id"] not in inserted or use_pgvector():
+                continue
+            es_obj=build_es_document(row["id"], username, row["url"], row["description"], d, vector, row["tags"])
+            actions.append(({"index": {"_index": index_name, "_id": es_obj.id, "routing": username}}, es_document(es_obj)))
+        # sent directly rather than through bulk_writer so per-item outcomes can be reported
+        failed: Dict[str, str]=bulk_with_retry(actions) if actions else {}
+        if failed:
+            db.query(Content).filter(Content.id.in_(list(failed))).update({"status": FAILED}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        print("bulk import error: ", e)
+        db.rollback()
+        for pos, row in fresh or valid:
+            results[pos]={"status":"failed", "url":row["url"], "detail":"server error while importing"}
+        return results
+    finally:
+        db.close()
+
+    for pos, row in fresh:
+        if row["id"] not in inserted:
+            results[pos]={"status":"duplicate", "id":row["id"], "url":row["url"]}
+        elif row["id"] in failed:
+            results[pos]={"status":"failed", "id":row["id"], "url":row["url"], "detail":failed[row["id"]]}
+        else:
+            results[pos]={"status":"ok", "id":row["id"], "url":row["url"]}
+    return results
+
+
+def enqueue(content_id: str, claimed: bool=False) -> None:
+    _get_executor().submit(run_ingestion, content_id, claimed)
+
+
+# session advisory lock held by the one worker process that resumes ingestion at startup
+RESUME_LOCK_KEY=0x6d656d6f7261
+_resume_lock: Optional[Connection]=None
+
+_CLAIM_LEFTOVERS=text("""
+    UPDATE contents SET status = :processing
+    WHERE id IN (
+        SELECT id FROM contents WHERE status IN (:pending, :processing)
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id
+""")
+
+
+def resume_pending() -> int:
+    """Re-enqueue rows left pending or half-processed by a previous process.
+
+    Every worker process calls this at startup, but only the first one to take
+    the advisory lock resumes; it keeps the lock (and one pooled connection)
+    until shutdown, so workers that start later do not pick up rows that are
+    being processed. The rows are claimed in the same statement that selects them.
+    """
+    global _resume_lock
+    if _resume_lock is not None:
+        return 0
+    conn=engine.connect()
+    try:
+        locked=conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RESUME_LOCK_KEY}).scalar()
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not locked:
+        conn.close()
+        return 0
+    _resume_lock=conn
+
+    db: Session=SessionLocal()
+    try:
+        content_ids=list(db.execute(_CLAIM_LEFTOVERS, {"pending": PENDING, "processing": PROCESSING}).scalars().all())
+        db.commit()
+    finally:
+        db.close()
+    for cid in content_ids:
+        enqueue(cid, claimed=True)
+    return len(content_ids)
+
+
+def shutdown() -> None:
+    global _executor, _bulk_pool, _resume_lock
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=False)
+        _executor=None
+    if _bulk_pool is not None:
+        _bulk_pool.shutdown(wait=True)
+        _bulk_pool=None
+    if _resume_lock is not None:
+        # closing the session releases the advisory lock for the next process
+        _resume_lock.close()
+        _resume_lock=None
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import threading
+import time
+
+
+class LRUCache:
+    """Small thread-safe LRU with an optional per-entry TTL and hit/miss counters.
+
+    on_evict(key) is called, outside the cache lock, for entries dropped by
+    capacity or found expired; not for pop() or clear().
+    """
+
+    def __init__(self, maxsize: int=1024, ttl: Optional[float]=None, on_evict: Optional[Callable[[Hashable], None]]=None):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self.on_evict=on_evict
+        self._data: "OrderedDict[Hashable, tuple]"=OrderedDict()
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        with self._lock:
+            item=self._data.get(key)
+            if item is None:
+                self.misses+=1
+                return default
+            value, expires_at=item
+            expired=expires_at is not None and expires_at<=time.monotonic()
+            if expired:
+                del self._data[key]
+                self.misses+=1
+            else:
+                self._data.move_to_end(key)
+                self.hits+=1
+        if expired:
+            self._evicted([key])
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float]=None) -> None:
+        ttl=self.ttl if ttl is None else ttl
+        expires_at=time.monotonic() + ttl if ttl is not None else None
+        evicted: List[Hashable]=[]
+        with self._lock:
+            self._data[key]=(value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data)>self.maxsize:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions+=1
+        self._evicted(evicted)
+
+    def _evicted(self, keys: List[Hashable]) -> None:
+        if self.on_evict is not None:
+            for key in keys:
+                self.on_evict(key)
+
+    def pop(self, key: Hashable, default: Any=None) -> Any:
+        with self._lock:
+            item=self._data.pop(key, None)
+        return item[0] if item is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,100 @@
+"""Search over contents in Postgres, used when VECTOR_STORE=pgvector.
+
+Results are shaped like OpenSearch hits (``_source``, ``_score``, ``sort``)
+so app.utils.search can fuse and paginate them the same way.
+"""
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from app.db.pg import SessionLocal
+from app.db.pgvector import PGVECTOR_EF_SEARCH, SEARCH_TSVECTOR, Vector, EMBEDDING_DIMS
+
+_vector=Vector(EMBEDDING_DIMS).bind_processor(None)
+
+# OR semantics like multi_match: plainto_tsquery joins terms with &, swap them for |
+_TSQUERY="replace(plainto_tsquery('simple', :q)::text, '&', '|')::tsquery"
+
+_KNN=text("""
+    SELECT id, description, url_description, title, embedding <-> CAST(:v AS vector) AS distance
+    FROM contents
+    WHERE username = :owner AND embedding IS NOT NULL
+    ORDER BY embedding <-> CAST(:v AS vector)
+    LIMIT :k
+""")
+
+# ts_rank_cd is real (float4); it is widened to float8 so the rank that comes back in a
+# cursor compares equal to the column, otherwise rows tied with the last one are skipped
+_LEXICAL=f"""
+    SELECT id, rank FROM (
+        SELECT id, ts_rank_cd({SEARCH_TSVECTOR}, {_TSQUERY})::float8 AS rank
+        FROM contents
+        WHERE username = :owner AND {SEARCH_TSVECTOR} @@ {_TSQUERY}
+    ) ranked
+    {{after}}
+    ORDER BY rank DESC, id ASC
+    LIMIT :size
+"""
+
+
+def knn(vector: List[float], size: int, owner: str, k: int, min_score: Optional[float]=None) -> List[Dict[str, Any]]:
+    """Nearest contents of one owner, scored 1 / (1 + d^2) like the OpenSearch l2 space."""
+    db=SessionLocal()
+    try:
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {max(PGVECTOR_EF_SEARCH, k)}"))
+        try:
+            # pgvector >= 0.8: keep scanning the graph until k rows pass the owner filter
+            with db.begin_nested():
+                db.execute(text("SET LOCAL hnsw.iterative_scan = strict_order"))
+        except Exception:
+            pass
+        rows=db.execute(_KNN, {"v": _vector(vector), "owner": owner, "k": k}).all()
+    finally:
+        db.close()
+    hits=[]
+    for row in rows:
+        score=1 / (1 + row.distance ** 2)
+        if min_score is not None and score<min_score:
+            continue
+        hits.append({
+            "_source": {"id": row.id, "description": row.description, "url_description": row.url_description, "title": row.title},
+            "_score": score,
+        })
+    return hits[:size]
+
+
+def lexical(query: str, size: int, owner: str, after: Optional[List[Any]]=None) -> List[Dict[str, Any]]:
+    """Full-text matches of one owner ordered by (rank desc, id asc); ``after`` is the last hit's sort values."""
+    params: Dict[str, Any]={"q": query, "owner": owner, "size": size}
+    where=""
+    if after:
+        where="WHERE rank < CAST(:after_rank AS float8) OR (rank = CAST(:after_rank AS float8) AND id > :after_id)"
+        params.update(after_rank=after[0], after_id=after[1])
+    db=SessionLocal()
+    try:
+        rows=db.execute(text(_LEXICAL.format(after=where)), params).all()
+    finally:
+        db.close()
+    return [{"_source": {"id": row.id}, "_score": row.rank, "sort": [row.rank, row.id]} for row in rows]
+
+
+# same inputs as the OpenSearch completion field: title, site name, domain and tags
+_SUGGEST=text("""
+    SELECT DISTINCT ON (lower(value)) value, id FROM (
+        SELECT id, timestamp, unnest(ARRAY[title, site_name, domain] || coalesce(tags, ARRAY[]::varchar[])) AS value
+        FROM contents
+        WHERE username = :owner
+    ) inputs
+    WHERE value ILIKE :prefix ESCAPE '\\'
+    ORDER BY lower(value), timestamp DESC
+    LIMIT :size
+""")
+
+
+def suggest(prefix: str, size: int, owner: str) -> List[Dict[str, Any]]:
+    """Prefix matches of one owner's titles, site names, domains and tags, one per distinct text."""
+    pattern=prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    db=SessionLocal()
+    try:
+        rows=db.execute(_SUGGEST, {"owner": owner, "prefix": pattern, "size": size}).all()
+    finally:
+        db.close()
+    return [{"text": row.value, "id": row.id} for row in rows]
@@ -0,0 +1,65 @@
+from collections import Counter
+from typing import List
+from dotenv import load_dotenv
+import os
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from app.db.pg import SessionLocal
+from app.db.ess import client as es_client, index_name
+from app.db.pgvector import use_pgvector
+from app.models.models import Content, User
+from app.utils import answer_cache, graph, tag_counts
+load_dotenv()
+
+# libraries larger than this are deleted in a background job and the route answers 202
+DELETE_BACKGROUND_THRESHOLD=int(os.getenv('DELETE_BACKGROUND_THRESHOLD','2000'))
+
+def count_contents(db: Session, username: str) -> int:
+    return db.execute(select(func.count()).select_from(Content).where(Content.username==username)).scalar_one()
+
+
+def delete_index_documents(username: str) -> None:
+    """Drop every document owned by username; routing keeps it on that user's shard."""
+    if use_pgvector():
+        return
+    es_client.delete_by_query(
+        index=index_name,
+        body={"query": {"term": {"owner": username}}},
+        routing=username,
+        conflicts="proceed",
+    )
+
+
+def delete_user_contents(db: Session, username: str) -> List[str]:
+    """Delete every content of a user with set-based SQL; returns the deleted ids.
+
+    Connections to and from the deleted contents go with them (content_edges
+    cascades on both ends) and their tags are released in the same transaction.
+    The caller commits and then removes the index documents.
+    """
+    rows=db.execute(delete(Content).where(Content.username==username).returning(Content.id, Content.tags)).all()
+    released: Counter=Counter(tag for row in rows for tag in set(row.tags or []))
+    tag_counts.apply(db, {tag: -n for tag, n in released.items()})
+    return [row.id for row in rows]
+
+
+def purge_contents(username: str, delete_user: bool=False) -> None:
+    """Background job: delete a user's library (and optionally the user) in its own session."""
+    db: Session=SessionLocal()
+    try:
+        delete_user_contents(db, username)
+        if delete_user:
+            db.execute(delete(User).where(User.username==username))
+        db.commit()
+        answer_cache.invalidate_owner(username)
+        graph.bump(username)
+    except Exception as e:
+        print("purge error: ", e)
+        db.rollback()
+        return
+    finally:
+        db.close()
+    try:
+        delete_index_documents(username)
+    except Exception as e:
+        print("purge index error: ", e)
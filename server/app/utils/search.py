@@ -0,0 +1,274 @@
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import uuid
+import os
+from app.db.ess import async_client as es_async, index_name, knn_filter_supported, encode_vector
+from app.db.pgvector import use_pgvector
+from app.utils import url as url_utils, pg_search
+from app.utils.lru import LRUCache
+load_dotenv()
+
+# each retriever returns k * HYBRID_WINDOW_FACTOR candidates before fusion
+HYBRID_WINDOW_FACTOR=int(os.getenv('HYBRID_WINDOW_FACTOR','4'))
+# k in the reciprocal rank fusion formula 1 / (k + rank)
+RRF_RANK_CONSTANT=int(os.getenv('RRF_RANK_CONSTANT','60'))
+# kNN fetches ceil(size * VECTOR_OVERSAMPLE) neighbours so filtering and min_score still leave size hits
+VECTOR_OVERSAMPLE=float(os.getenv('VECTOR_OVERSAMPLE','1.5'))
+# how long a paginated search keeps its point in time open between pages
+SEARCH_PIT_KEEP_ALIVE=os.getenv('SEARCH_PIT_KEEP_ALIVE','2m')
+HYBRID_PAGE_CACHE_SIZE=int(os.getenv('HYBRID_PAGE_CACHE_SIZE','256'))
+
+# ranked ids with their scores, best first
+Ranking=List[Dict[str, Any]]
+
+# (pit id, query fingerprint) -> (fused ranking, retrievers exhausted); lives about as long as a pit
+_hybrid_pages=LRUCache(maxsize=HYBRID_PAGE_CACHE_SIZE, ttl=120)
+
+
+def _owner_filter(owner: str) -> Dict[str, Any]:
+    return {"term": {"owner": owner}}
+
+
+def lexical_query(text: str, size: int, owner: str) -> Dict[str, Any]:
+    return {
+        "size": size,
+        "_source": ["id"],
+        "query": {
+            "bool": {
+                "must": {
+                    "multi_match": {
+                        "query": text,
+                        "fields": ["description", "url"]
+                    }
+                },
+                "filter": _owner_filter(owner)
+            }
+        }
+    }
+
+
+def vector_query(vector: List[float], size: int, owner: str, k: Optional[int]=None, source: Optional[List[str]]=None) -> Dict[str, Any]:
+    """kNN restricted to one owner's documents.
+
+    On lucene/faiss indexes the owner filter runs inside the graph search, so
+    k neighbours are always drawn from the owner's library. Older nmslib indexes
+    only support filtering the k results afterwards.
+    """
+    knn={"vector": encode_vector(vector), "k": k or math.ceil(size * VECTOR_OVERSAMPLE)}
+    if knn_filter_supported():
+        query={"knn": {"embeddings.vector": {**knn, "filter": _owner_filter(owner)}}}
+    else:
+        query={"bool": {"must": {"knn": {"embeddings.vector": knn}}, "filter": _owner_filter(owner)}}
+    return {
+        "size": size,
+        "_source": source or ["id"],
+        "query": query
+    }
+
+
+def _hits(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return response.get("hits", {}).get("hits", [])
+
+
+def _ranking(hits: List[Dict[str, Any]]) -> Ranking:
+    return [{"id": hit["_source"]["id"], "score": hit.get("_score") or 0.0} for hit in hits]
+
+
+async def run_query(body: Dict[str, Any], owner: str, timeout: float, pit: Optional[str]=None) -> Dict[str, Any]:
+    if pit is not None:
+        # the point in time already pins the index and the owner's shard
+        body={**body, "pit": {"id": pit, "keep_alive": SEARCH_PIT_KEEP_ALIVE}}
+        return await es_async.search(index=None, body=body, request_timeout=timeout)
+    # documents are routed by owner, so the search only touches that user's shard
+    return await es_async.search(index=index_name, body=body, routing=owner, request_timeout=timeout)
+
+
+def suggest_query(prefix: str, size: int, owner: str) -> Dict[str, Any]:
+    return {
+        "_source": ["id"],
+        "suggest": {
+            "content": {
+                "prefix": prefix,
+                "completion": {
+                    "field": "suggest",
+                    "size": size,
+                    "skip_duplicates": True,
+                    "contexts": {"owner": [owner]}
+                }
+            }
+        }
+    }
+
+
+async def suggest(prefix: str, size: int, owner: str, timeout: float) -> List[Dict[str, Any]]:
+    """Completions of prefix over one owner's titles, site names, domains and tags, as [{"text", "id"}]."""
+    if use_pgvector():
+        return await asyncio.to_thread(pg_search.suggest, prefix, size, owner)
+    response=await run_query(suggest_query(prefix, size, owner), owner, timeout)
+    options=[option for entry in response.get("suggest", {}).get("content", []) for option in entry.get("options", [])]
+    return [{"text": option["text"], "id": option["_source"]["id"]} for option in options]
+
+
+async def lexical_search(text: str, size: int, owner: str, timeout: float, pit: Optional[str]=None) -> Ranking:
+    if use_pgvector():
+        return _ranking(await asyncio.to_thread(pg_search.lexical, text, size, owner))
+    return _ranking(_hits(await run_query(lexical_query(text, size, owner), owner, timeout, pit)))
+
+
+async def vector_search(text: str, size: int, owner: str, timeout: float, pit: Optional[str]=None) -> Ranking:
+    vector=await url_utils.aget_text_embeddings(text)
+    return _ranking(await context_hits(vector, size, owner, timeout, pit=pit))
+
+
+async def context_hits(vector: List[float], size: int, owner: str, timeout: float, min_score: Optional[float]=None,
+                       source: Optional[List[str]]=None, pit: Optional[str]=None) -> List[Dict[str, Any]]:
+    """Raw kNN hits (with _source) for one owner, from whichever vector store is configured."""
+    if use_pgvector():
+        return await asyncio.to_thread(pg_search.knn, vector, size, owner, math.ceil(size * VECTOR_OVERSAMPLE), min_score)
+    body=vector_query(vector, size, owner, source=source)
+    if min_score is not None:
+        body["min_score"]=min_score
+    return _hits(await run_query(body, owner, timeout, pit))
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, required: Tuple[str, ...]=("pit", "fp")) -> Dict[str, Any]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        data=json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("malformed cursor")
+    if not isinstance(data, dict) or any(key not in data for key in required):
+        raise ValueError("malformed cursor")
+    return data
+
+
+async def open_pit(owner: str) -> str:
+    if use_pgvector():
+        # Postgres pages by keyset, the token only ties the pages of one search together
+        return f"pg:{uuid.uuid4()}"
+    response=await es_async.create_pit(index_name, keep_alive=SEARCH_PIT_KEEP_ALIVE, routing=owner)
+    return response["pit_id"]
+
+
+async def close_pit(pit: str) -> None:
+    if pit.startswith("pg:"):
+        return
+    try:
+        await es_async.delete_pit([pit])
+    except Exception as e:
+        # it expires on its own after SEARCH_PIT_KEEP_ALIVE
+        print("opensearch pit delete error: ", e)
+
+
+async def lexical_page(text: str, size: int, owner: str, timeout: float, pit: str,
+                       after: Optional[List[Any]]=None) -> Tuple[Ranking, Optional[List[Any]]]:
+    """One page of BM25 results inside a point in time.
+
+    Ordered by score with the id as tie-breaker so pages never overlap; one
+    extra hit is fetched to know whether another page exists. Returns the
+    page and the search_after values for the next one (None on the last page).
+    """
+    if use_pgvector():
+        hits=await asyncio.to_thread(pg_search.lexical, text, size + 1, owner, after)
+    else:
+        body=lexical_query(text, size + 1, owner)
+        body["sort"]=[{"_score": "desc"}, {"id": "asc"}]
+        if after:
+            body["search_after"]=after
+        hits=_hits(await run_query(body, owner, timeout, pit))
+    page=hits[:size]
+    return _ranking(page), (page[-1]["sort"] if len(hits)>size else None)
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, Ranking], weights: Dict[str, float], rank_constant: int=RRF_RANK_CONSTANT) -> Ranking:
+    """score(d) = sum over retrievers of weight / (rank_constant + rank); ranks start at 1."""
+    fused: Dict[str, Dict[str, Any]]={}
+    for name, ranking in rankings.items():
+        for rank, hit in enumerate(ranking, start=1):
+            entry=fused.setdefault(hit["id"], {"id": hit["id"], "score": 0.0})
+            entry["score"]+=weights.get(name, 1.0) / (rank_constant + rank)
+            entry[f"{name}_rank"]=rank
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)
+
+
+def weighted_fusion(rankings: Dict[str, Ranking], weights: Dict[str, float]) -> Ranking:
+    """Min-max normalise each retriever's scores to [0, 1] and sum them with the given weights.
+
+    BM25 scores are unbounded while kNN scores are not, so raw scores are not comparable.
+    """
+    fused: Dict[str, Dict[str, Any]]={}
+    for name, ranking in rankings.items():
+        if not ranking:
+            continue
+        scores=[h["score"] for h in ranking]
+        low, high=min(scores), max(scores)
+        for rank, hit in enumerate(ranking, start=1):
+            normalised=(hit["score"] - low) / (high - low) if high>low else 1.0
+            entry=fused.setdefault(hit["id"], {"id": hit["id"], "score": 0.0})
+            entry["score"]+=weights.get(name, 1.0) * normalised
+            entry[f"{name}_rank"]=rank
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)
+
+
+async def _fused_ranking(text: str, window: int, owner: str, timeout: float, pit: Optional[str], fusion: str,
+                         weights: Dict[str, float], rank_constant: int) -> Tuple[Ranking, bool]:
+    lexical, vector=await asyncio.gather(
+        lexical_search(text, window, owner, timeout, pit),
+        vector_search(text, window, owner, timeout, pit),
+        return_exceptions=True
+    )
+    rankings: Dict[str, Ranking]={}
+    for name, result in (("lexical", lexical), ("vector", vector)):
+        if isinstance(result, BaseException):
+            print(f"hybrid {name} retriever error: ", result)
+            continue
+        rankings[name]=result
+    if not rankings:
+        raise lexical if isinstance(lexical, BaseException) else vector
+
+    if fusion=="weighted":
+        fused=weighted_fusion(rankings, weights)
+    else:
+        fused=reciprocal_rank_fusion(rankings, weights, rank_constant)
+    exhausted=all(len(r)<window for r in rankings.values())
+    return [{**hit, "score": round(hit["score"], 6)} for hit in fused], exhausted
+
+
+async def hybrid_search(text: str, k: int, owner: str, timeout: float, fusion: str="rrf", lexical_weight: float=1.0,
+                        vector_weight: float=1.0, rank_constant: Optional[int]=None, offset: int=0,
+                        pit: Optional[str]=None) -> Tuple[Ranking, bool]:
+    """Run the lexical and vector retrievers concurrently and fuse them into one ranked list.
+
+    The BM25 query runs while the query is being embedded. If one retriever
+    fails the other one's ranking is still returned; if both fail the first
+    error is raised. Returns hits offset..offset+k and whether more exist.
+
+    Paginated calls pass a point in time so every page ranks the same
+    snapshot; the fused list is kept per pit so later pages are sliced from
+    it and the retrievers only run again once a page goes past its depth.
+    """
+    weights={"lexical": lexical_weight, "vector": vector_weight}
+    rank_constant=rank_constant or RRF_RANK_CONSTANT
+    memo_key=(pit, fingerprint(text, fusion, weights, rank_constant)) if pit else None
+    memo=_hybrid_pages.get(memo_key) if memo_key else None
+    if memo is not None and (memo[1] or len(memo[0])>offset + k):
+        fused=memo[0]
+    else:
+        window=(offset + k) * HYBRID_WINDOW_FACTOR
+        fused, exhausted=await _fused_ranking(text, window, owner, timeout, pit, fusion, weights, rank_constant)
+        if memo_key:
+            _hybrid_pages.set(memo_key, (fused, exhausted))
+    return fused[offset:offset + k], len(fused)>offset + k
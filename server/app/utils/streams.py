@@ -0,0 +1,85 @@
+"""Bookkeeping for the RAG answer streams (server-sent events).
+
+Slots are counted per process, so with N workers a user can hold up to
+N * MAX_STREAMS_PER_USER streams in total.
+"""
+from typing import Any, AsyncIterator, Dict, Optional
+from dotenv import load_dotenv
+from fastapi import Request
+import asyncio
+import os
+load_dotenv()
+
+MAX_STREAMS_PER_USER=int(os.getenv('MAX_STREAMS_PER_USER','2'))
+# seconds without a chunk before a ": ping" comment is sent to keep proxies from closing the stream
+SSE_HEARTBEAT_INTERVAL=float(os.getenv('SSE_HEARTBEAT_INTERVAL','15'))
+
+HEARTBEAT=": ping\n\n"
+
+# owner -> open streams; only touched from the event loop, so no lock
+_open: Dict[str, int]={}
+_counters={"started": 0, "completed": 0, "cancelled": 0, "rejected": 0, "heartbeats": 0}
+
+
+def acquire(owner: str) -> bool:
+    """Take a stream slot for owner; False when the user is already at MAX_STREAMS_PER_USER."""
+    if _open.get(owner, 0)>=MAX_STREAMS_PER_USER:
+        _counters["rejected"]+=1
+        return False
+    _open[owner]=_open.get(owner, 0) + 1
+    _counters["started"]+=1
+    return True
+
+
+def release(owner: str, completed: bool) -> None:
+    left=_open.get(owner, 0) - 1
+    if left>0:
+        _open[owner]=left
+    else:
+        _open.pop(owner, None)
+    _counters["completed" if completed else "cancelled"]+=1
+
+
+async def with_heartbeats(source: AsyncIterator[Any], request: Request, interval: float=SSE_HEARTBEAT_INTERVAL) -> AsyncIterator[Optional[Any]]:
+    """Yield items from source, and None whenever it is silent for interval seconds.
+
+    Stops as soon as the client has disconnected. The pending read is
+    cancelled and source is closed, which aborts the upstream request.
+    """
+    pending: Optional[asyncio.Task]=None
+    try:
+        while True:
+            if await request.is_disconnected():
+                return
+            if pending is None:
+                pending=asyncio.ensure_future(source.__anext__())
+            done, _=await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                _counters["heartbeats"]+=1
+                yield None
+                continue
+            task, pending=pending, None
+            try:
+                item=task.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if pending is not None:
+            # the read must have finished before the generator can be closed
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        aclose=getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def stats() -> Dict[str, int]:
+    return {
+        **_counters,
+        "open": sum(_open.values()),
+        "users_streaming": len(_open),
+    }
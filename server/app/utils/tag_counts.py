@@ -0,0 +1,85 @@
+"""Tag usage counts: how many contents carry each tag.
+
+Writes change counts by the difference between a content's old and new tags,
+in the caller's transaction. Rows are touched in tagname order, so concurrent
+saves lock them in the same order and cannot deadlock. repair() recomputes
+everything from contents.tags.
+"""
+from typing import Dict, Iterable, List, Optional
+import uuid
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Executable
+from app.models.models import Tag
+
+
+def deltas(old: Optional[Iterable[str]], new: Optional[Iterable[str]]) -> Dict[str, int]:
+    """+1 for tags a content gained, -1 for tags it lost; a tag listed twice on one content counts once."""
+    before=set(old or [])
+    after=set(new or [])
+    changes={tag: 1 for tag in after - before}
+    changes.update({tag: -1 for tag in before - after})
+    return changes
+
+
+def statements(changes: Dict[str, int]) -> List[Executable]:
+    """One INSERT ... ON CONFLICT DO UPDATE applying every change, plus a cleanup of tags nobody uses any more."""
+    changes={tag: n for tag, n in changes.items() if tag and n}
+    if not changes:
+        return []
+    rows=[{"id": str(uuid.uuid4()), "tagname": tag, "count": changes[tag]} for tag in sorted(changes)]
+    stmt=insert(Tag).values(rows)
+    upsert=stmt.on_conflict_do_update(
+        index_elements=[Tag.tagname],
+        set_={"count": func.greatest(Tag.count + stmt.excluded.count, 0)},
+    )
+    result: List[Executable]=[upsert]
+    released=[tag for tag, n in changes.items() if n<0]
+    if released:
+        result.append(delete(Tag).where(Tag.tagname.in_(released), Tag.count<=0))
+    return result
+
+
+def apply(db: Session, changes: Dict[str, int]) -> None:
+    for stmt in statements(changes):
+        db.execute(stmt)
+
+
+# contents per tag, counting each content once however often it lists the tag
+_ACTUAL=text("""
+    SELECT tag, count(DISTINCT id) AS n
+    FROM contents, unnest(tags) AS tag
+    WHERE tag IS NOT NULL AND tag <> ''
+    GROUP BY tag
+""")
+
+
+def repair(db: Session, dry_run: bool=False) -> Dict[str, int]:
+    """Make every count match contents.tags: fix drifted counts, add missing tags, drop unused ones.
+
+    The tags table is locked for writes while counting, so saves that run
+    meanwhile apply their change after the repair instead of being lost.
+    """
+    db.execute(text("LOCK TABLE tags IN SHARE ROW EXCLUSIVE MODE"))
+    actual={row.tag: row.n for row in db.execute(_ACTUAL)}
+    stored={tag.tagname: tag.count for tag in db.query(Tag).all()}
+    report={"fixed": 0, "added": 0, "removed": 0}
+    for tagname, n in sorted(actual.items()):
+        if tagname not in stored:
+            report["added"]+=1
+            if not dry_run:
+                db.add(Tag(tagname=tagname, count=n))
+        elif stored[tagname]!=n:
+            report["fixed"]+=1
+            if not dry_run:
+                db.query(Tag).filter(Tag.tagname==tagname).update({"count": n}, synchronize_session=False)
+    unused=[tagname for tagname in stored if tagname not in actual]
+    report["removed"]=len(unused)
+    if unused and not dry_run:
+        db.query(Tag).filter(Tag.tagname.in_(unused)).delete(synchronize_session=False)
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    return report
@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from datetime import datetime
+from dotenv import load_dotenv
+import os
+from sqlalchemy.dialects.postgresql import insert
+from app.db.pg import SessionLocal
+from app.models.models import UrlCache
+from app.schemas.schemas import UrlBase
+from app.utils.lru import LRUCache
+load_dotenv()
+
+URL_CACHE_TTL=int(os.getenv('URL_CACHE_TTL', str(24 * 60 * 60)))
+URL_CACHE_SIZE=int(os.getenv('URL_CACHE_SIZE','2048'))
+
+# query parameters that never change what the page renders
+_TRACKING_PARAMS=("fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref_src")
+_DEFAULT_PORTS={"http": 80, "https": 443}
+
+
+@dataclass
+class CachedUrl:
+    details: UrlBase
+    etag: Optional[str]=None
+    last_modified: Optional[str]=None
+    fetched_at: int=0
+
+    @property
+    def fresh(self) -> bool:
+        return _now() - self.fetched_at<URL_CACHE_TTL
+
+    def validators(self) -> Dict[str, str]:
+        headers={}
+        if self.etag:
+            headers["If-None-Match"]=self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"]=self.last_modified
+        return headers
+
+
+_memory=LRUCache(maxsize=URL_CACHE_SIZE)
+
+
+def _now() -> int:
+    return int(datetime.now().timestamp())
+
+
+def normalize_url(url: str) -> str:
+    parsed=urlparse(url.strip())
+    scheme=(parsed.scheme or "https").lower()
+    host=(parsed.hostname or "").lower()
+    port=parsed.port
+    netloc=host if port is None or _DEFAULT_PORTS.get(scheme)==port else f"{host}:{port}"
+    query=[
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    query.sort()
+    return urlunparse((scheme, netloc, parsed.path or "/", "", urlencode(query), ""))
+
+
+def lookup(key: str) -> Optional[CachedUrl]:
+    entry=_memory.get(key)
+    if entry is not None:
+        return entry
+
+    db=SessionLocal()
+    try:
+        row=db.query(UrlCache).filter(UrlCache.url==key).first()
+    except Exception as e:
+        print("error: ", e)
+        row=None
+    finally:
+        db.close()
+    if row is None:
+        return None
+
+    entry=CachedUrl(
+        details=UrlBase(
+            domain=row.domain or "",
+            favicon=row.favicon,
+            title=row.title,
+            url_description=row.url_description,
+            thumbnail=row.thumbnail,
+            site_name=row.site_name or row.domain or "",
+        ),
+        etag=row.etag,
+        last_modified=row.last_modified,
+        fetched_at=row.fetched_at or 0,
+    )
+    _memory.set(key, entry)
+    return entry
+
+
+def store(key: str, details: UrlBase, etag: Optional[str]=None, last_modified: Optional[str]=None) -> CachedUrl:
+    entry=CachedUrl(details=details, etag=etag, last_modified=last_modified, fetched_at=_now())
+    _memory.set(key, entry)
+
+    values={
+        "url": key,
+        **details.model_dump(),
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": entry.fetched_at,
+    }
+    stmt=insert(UrlCache).values(**values)
+    stmt=stmt.on_conflict_do_update(
+        index_elements=[UrlCache.url],
+        set_={k: stmt.excluded[k] for k in values if k!="url"},
+    )
+    db=SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        print("error: ", e)
+        db.rollback()
+    finally:
+        db.close()
+    return entry
+
+
+def touch(key: str, entry: CachedUrl) -> CachedUrl:
+    """Mark a revalidated (304) entry as fresh again without rewriting its metadata."""
+    entry=CachedUrl(details=entry.details, etag=entry.etag, last_modified=entry.last_modified, fetched_at=_now())
+    _memory.set(key, entry)
+    db=SessionLocal()
+    try:
+        db.query(UrlCache).filter(UrlCache.url==key).update({"fetched_at": entry.fetched_at}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        print("error: ", e)
+        db.rollback()
+    finally:
+        db.close()
+    return entry
+
+
+def stats() -> Dict[str, int]:
+    return _memory.stats()
@@ -0,0 +1,38 @@
+import pytest
+from app.utils import answer_cache
+from app.utils.lru import LRUCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(answer_cache, "_by_content", {})
+    monkeypatch.setattr(answer_cache, "_vectors", {})
+    monkeypatch.setattr(answer_cache, "_answers", LRUCache(maxsize=2, on_evict=answer_cache._unlink))
+    return answer_cache
+
+
+def test_side_indexes_follow_capacity_evictions(cache):
+    keys=[cache.make_key("owner", f"question {i}?", [f"c{i}", "shared"], "v1") for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.put(key, [f"answer {i}"], vector=[1.0, float(i)])
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[4])==["answer 4"]
+    assert set(cache._by_content)=={"c3", "c4", "shared"}
+    assert cache._by_content["shared"]=={keys[3], keys[4]}
+    assert sum(len(entries) for entries in cache._vectors.values())==2
+
+
+def test_invalidate_clears_the_side_indexes(cache):
+    a=cache.make_key("owner", "What is it?", ["c1"], "v1")
+    b=cache.make_key("owner", "Where is it?", ["c1", "c2"], "v1")
+    cache.put(a, ["x"], vector=[1.0, 0.0])
+    cache.put(b, ["y"], vector=[0.0, 1.0])
+
+    cache.invalidate(["c1"])
+    assert cache.get(a) is None and cache.get(b) is None
+    assert cache._by_content=={} and cache._vectors=={}
+
+
+def test_questions_are_normalised_into_one_key():
+    assert answer_cache.make_key("o", "  What   is Memora?? ", ["c1"], "v1")==answer_cache.make_key("o", "what is memora", ["c1"], "v1")
@@ -0,0 +1,77 @@
+import re
+import pytest
+from app.utils import bookmarks
+
+NETSCAPE="""<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3 ADD_DATE="1600000000">Reading</H3>
+    <DL><p>
+        <DT><A HREF="https://example.com/a" ADD_DATE="1700000000" TAGS="python, web">Article   A</A>
+        <DD>Long
+            description &amp; notes
+        <DT><A HREF="javascript:alert(1)">Bookmarklet</A>
+        <DT><A HREF="https://example.com/b">Café B</A>
+    </DL><p>
+    <DT><A HREF="place:sort=8">Recent</A>
+    <DT><A HREF="http://example.org/c" TIME_ADDED="1650000000">C</A>
+</DL><p>
+"""
+
+
+def feed_in_chunks(parser, body: bytes, size: int):
+    items=[]
+    for start in range(0, len(body), size):
+        items.extend(parser.feed_bytes(body[start:start + size]))
+    items.extend(parser.finish())
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_netscape_export(size):
+    # chunk boundaries fall inside tags, entities and multi-byte characters
+    items=feed_in_chunks(bookmarks.BookmarkHtmlParser(), NETSCAPE.encode("utf-8"), size)
+    assert items==[
+        {"url": "https://example.com/a", "tags": ["python", "web"], "timestamp": 1700000000000,
+         "title": "Article A", "description": "Long description & notes"},
+        {"url": "https://example.com/b", "tags": [], "title": "Café B"},
+        {"url": "http://example.org/c", "tags": [], "timestamp": 1650000000000, "title": "C"},
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_ndjson_lines(size):
+    body='{"url": "https://example.com/1", "tags": "a, b"}\n\n[1, 2]\nnot json\n{"url": "https://example.com/ü"}'.encode("utf-8")
+    items=feed_in_chunks(bookmarks.NdjsonParser(), body, size)
+    assert items==[
+        {"url": "https://example.com/1", "tags": ["a", "b"]},
+        {"error": "expected an object on line 3"},
+        {"error": "invalid json on line 4"},
+        {"url": "https://example.com/ü"},
+    ]
+
+
+@pytest.mark.parametrize("content_type, first_chunk, expected", [
+    ("text/html; charset=utf-8", b"{}", bookmarks.BookmarkHtmlParser),
+    ("application/x-ndjson", b"<a>", bookmarks.NdjsonParser),
+    ("", b"  <!DOCTYPE NETSCAPE", bookmarks.BookmarkHtmlParser),
+    ("application/octet-stream", b'{"url": "x"}', bookmarks.NdjsonParser),
+])
+def test_make_parser(content_type, first_chunk, expected):
+    assert isinstance(bookmarks.make_parser(content_type, first_chunk), expected)
+
+
+def test_import_items_are_validated_and_normalised():
+    from app.utils import ingest
+
+    row=ingest._bulk_item({"url": " https://example.com/a ", "tags": ["b", " a", "b", ""], "timestamp": 1700000000000})
+    assert (row["url"], row["tags"], row["timestamp"], row["color"])==("https://example.com/a", ["a", "b"], 1700000000, ingest.BULK_DEFAULT_COLOR)
+    for item, reason in [
+        ({"error": "invalid json on line 4"}, "invalid json on line 4"),
+        ({"url": "ftp://example.com"}, "url must be an absolute http(s) url"),
+        ({"url": "https://example.com", "tags": "a,b"}, "tags must be a list of strings"),
+    ]:
+        with pytest.raises(ValueError, match=re.escape(reason)):
+            ingest._bulk_item(item)
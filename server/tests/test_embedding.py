@@ -0,0 +1,37 @@
+import threading
+import pytest
+from app.utils import embedding
+
+
+def test_batcher_counts_every_item_across_threads():
+    calls=[]
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    batcher=embedding.EmbeddingBatcher(embed_batch, max_batch=8, max_wait_ms=1, max_inflight=4)
+    results={}
+
+    def worker(n):
+        results[n]=batcher.embed_many([f"text {n} {i}" for i in range(25)])
+
+    threads=[threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    stats=batcher.stats()
+    assert stats["items"]==8 * 25
+    assert stats["batches"]==len(calls)
+    assert results[3][10]==[float(len("text 3 10"))]
+
+
+def test_provider_without_embed_batch_cannot_be_created():
+    class Incomplete(embedding.EmbeddingProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
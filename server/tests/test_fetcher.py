@@ -0,0 +1,45 @@
+import asyncio
+from app.utils import fetcher
+
+
+def test_host_slots_limit_concurrency_and_are_dropped_when_idle(monkeypatch):
+    monkeypatch.setattr(fetcher, "FETCH_PER_HOST_LIMIT", 2)
+    monkeypatch.setattr(fetcher, "_host_limits", {})
+
+    async def run():
+        running=0
+        peak=0
+
+        async def fetch_one(host):
+            nonlocal running, peak
+            async with fetcher._host_slot(host):
+                running+=1
+                peak=max(peak, running)
+                await asyncio.sleep(0.01)
+                running-=1
+
+        tasks=[asyncio.ensure_future(fetch_one("a.example")) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert set(fetcher._host_limits)=={"a.example"}
+        await asyncio.gather(*tasks)
+        same_host_peak=peak
+        # a one-off fetch of many different hosts leaves nothing behind
+        await asyncio.gather(*(fetch_one(f"h{i}.example") for i in range(100)))
+        return same_host_peak
+
+    assert asyncio.run(run())==2
+    assert fetcher._host_limits=={}
+
+
+def test_host_slot_is_released_when_the_fetch_fails(monkeypatch):
+    monkeypatch.setattr(fetcher, "_host_limits", {})
+
+    async def run():
+        try:
+            async with fetcher._host_slot("down.example"):
+                raise ConnectionError("refused")
+        except ConnectionError:
+            pass
+
+    asyncio.run(run())
+    assert fetcher._host_limits=={}
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+import pytest
+from app.utils.html_meta import MetaExtractor
+
+URL="https://example.com/page"
+
+# (html, what the BeautifulSoup extractor this replaced returned for it)
+PAGES={
+    "no_head_no_body": (
+        """<!doctype html><title>Bare</title><p>hello</p><img src="/a.png" width="10" height="10"><img src="/big.png" width="100" height="50">""",
+        {"title": "Bare", "url_description": None, "thumbnail": "https://example.com/big.png"},
+    ),
+    "no_head_srcset": (
+        """<title>Srcset</title><img src="/s.png" srcset="/s-1x.png 100w, /s-2x.png 200w">""",
+        {"title": "Srcset", "url_description": None, "thumbnail": "https://example.com/s-2x.png"},
+    ),
+    "og_image": (
+        """<html><head><title>T</title><meta property="og:image" content="https://cdn.example.com/og.png"><meta property="og:title" content="OG Title"><meta name="description" content="desc"></head><body><img src="/body.png"></body></html>""",
+        {"title": "OG Title", "url_description": "desc", "thumbnail": "https://cdn.example.com/og.png"},
+    ),
+    "head_without_image": (
+        """<html><head><title>Plain</title></head><body><img src="/first.png"><img src="/second.png" width="300" height="200"></body></html>""",
+        {"title": "Plain", "url_description": None, "thumbnail": "https://example.com/second.png"},
+    ),
+    "twitter_no_head_tag": (
+        """<meta name="twitter:image" content="/tw.png"><title>Tw</title><img src="/x.png">""",
+        {"title": "Tw", "url_description": None, "thumbnail": "https://example.com/tw.png"},
+    ),
+    "nothing": (
+        """<html><head><title>Nothing</title></head><body><p>text only</p></body></html>""",
+        {"title": "Nothing", "url_description": None, "thumbnail": None},
+    ),
+}
+
+
+def extract(html: str, chunk_size: int=16):
+    """Feed the page in small chunks and stop when the extractor says so, like the fetcher does."""
+    extractor=MetaExtractor(URL)
+    body=html.encode("utf-8")
+    result=SimpleNamespace(encoding="utf-8")
+    for start in range(0, len(body), chunk_size):
+        if extractor.feed_chunk(body[start:start + chunk_size], result):
+            break
+    extractor.finish()
+    return extractor.to_url_base()
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_matches_previous_extractor(name):
+    html, expected=PAGES[name]
+    details=extract(html)
+    assert {key: getattr(details, key) for key in expected}==expected
+    assert details.favicon=="https://example.com/favicon.ico"
+    assert details.site_name=="example.com"
+
+
+def test_stops_reading_after_a_head_with_a_thumbnail():
+    extractor=MetaExtractor(URL)
+    assert extractor.feed_chunk(b'<html><head><meta property="og:image" content="/og.png"></head>', SimpleNamespace(encoding="utf-8"))
+
+
+def test_keeps_reading_the_body_when_the_head_has_no_thumbnail():
+    extractor=MetaExtractor(URL)
+    assert not extractor.feed_chunk(b'<html><head><title>x</title></head><body><p>', SimpleNamespace(encoding="utf-8"))
@@ -0,0 +1,67 @@
+from app.utils import ingest
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows=rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        return self.rows[0] if self.rows else None
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows=rows
+        self.statements=[]
+        self.closed=False
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement)
+        return Result(self.rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed=True
+
+
+def test_run_ingestion_skips_a_row_another_run_claimed(monkeypatch):
+    session=FakeSession([])
+    monkeypatch.setattr(ingest, "SessionLocal", lambda: session)
+    def enrich(content):
+        raise AssertionError("a row claimed elsewhere was enriched again")
+
+    monkeypatch.setattr(ingest, "enrich_content", enrich)
+    ingest.run_ingestion("c1")
+    claim=str(session.statements[0])
+    assert claim.startswith("UPDATE contents SET status=") and "RETURNING contents.id" in claim
+    assert session.closed
+
+
+def test_only_the_process_holding_the_lock_resumes(monkeypatch):
+    queued=[]
+    monkeypatch.setattr(ingest, "enqueue", lambda cid, claimed=False: queued.append((cid, claimed)))
+    monkeypatch.setattr(ingest, "_resume_lock", None)
+
+    monkeypatch.setattr(ingest, "engine", type("E", (), {"connect": lambda self: FakeSession([False])})())
+    assert ingest.resume_pending()==0 and ingest._resume_lock is None
+
+    lock=FakeSession([True])
+    monkeypatch.setattr(ingest, "engine", type("E", (), {"connect": lambda self: lock})())
+    monkeypatch.setattr(ingest, "SessionLocal", lambda: FakeSession(["c1", "c2"]))
+    assert ingest.resume_pending()==2
+    assert queued==[("c1", True), ("c2", True)]
+    assert ingest._resume_lock is lock and not lock.closed
+    # a second call in the same process does not resume again
+    assert ingest.resume_pending()==0
+    assert "FOR UPDATE SKIP LOCKED" in str(ingest._CLAIM_LEFTOVERS)
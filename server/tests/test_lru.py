@@ -0,0 +1,59 @@
+from app.utils import lru
+
+
+class Clock:
+    def __init__(self):
+        self.now=1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_capacity_evicts_least_recently_used():
+    evicted=[]
+    cache=lru.LRUCache(maxsize=2, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a")==1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert evicted==["b"]
+    assert cache.get("b") is None
+    assert cache.stats()=={"size": 2, "maxsize": 2, "hits": 1, "misses": 1, "evictions": 1}
+
+
+def test_expired_entries_are_dropped_and_reported(monkeypatch):
+    clock=Clock()
+    monkeypatch.setattr(lru.time, "monotonic", clock)
+    evicted=[]
+    cache=lru.LRUCache(maxsize=10, ttl=60, on_evict=evicted.append)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2)
+    clock.now+=10
+    assert cache.get("short", "gone")=="gone"
+    assert cache.get("long")==2
+    assert evicted==["short"]
+    assert len(cache)==1
+
+
+def test_pop_and_clear_do_not_call_the_hook():
+    evicted=[]
+    cache=lru.LRUCache(maxsize=10, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.pop("a")==1
+    cache.clear()
+    assert evicted==[] and len(cache)==0
+
+
+def test_hook_runs_outside_the_lock():
+    cache=None
+    seen=[]
+
+    def on_evict(key):
+        # would deadlock on the non-reentrant lock if called while holding it
+        seen.append((key, cache.get(key), len(cache)))
+
+    cache=lru.LRUCache(maxsize=1, on_evict=on_evict)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert seen==[("a", None, 1)]
@@ -0,0 +1,29 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routes import metrics
+from app.utils import auth as auth_utils
+
+
+def client():
+    app=FastAPI()
+    app.include_router(metrics.router)
+    return TestClient(app)
+
+
+def auth_header():
+    return {"Authorization": f"Bearer {auth_utils.create_access_token('alice')}"}
+
+
+def test_metrics_are_off_by_default(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    assert client().get("/api/metrics/", headers=auth_header()).status_code==404
+
+
+def test_metrics_need_a_valid_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    c=client()
+    assert c.get("/api/metrics/").status_code==401
+    assert c.get("/api/metrics/", headers={"Authorization": "Bearer not-a-token"}).status_code==401
+    response=c.get("/api/metrics/", headers=auth_header())
+    assert response.status_code==200
+    assert "answer_cache" in response.json()["metrics"]
@@ -0,0 +1,61 @@
+import asyncio
+from app.utils import pg_search, search
+
+
+class Row:
+    def __init__(self, id, rank):
+        self.id=id
+        self.rank=rank
+
+
+class Result(list):
+    def all(self):
+        return self
+
+
+class FakeSession:
+    """Answers the lexical query from in-memory (id, rank) rows, applying the keyset predicate."""
+
+    def __init__(self, rows, statements):
+        self.rows=rows
+        self.statements=statements
+
+    def execute(self, statement, params):
+        self.statements.append(str(statement))
+        ordered=sorted(self.rows, key=lambda r: (-r[1], r[0]))
+        if "after_rank" in params:
+            rank, last_id=params["after_rank"], params["after_id"]
+            ordered=[r for r in ordered if r[1]<rank or (r[1]==rank and r[0]>last_id)]
+        return Result(Row(i, r) for i, r in ordered[:params["size"]])
+
+    def close(self):
+        pass
+
+
+def test_rank_is_selected_as_float8():
+    sql=pg_search._LEXICAL.format(after="")
+    assert ")::float8 AS rank" in sql
+
+
+def test_keyset_pages_through_rank_ties(monkeypatch):
+    # most rows share a rank that float4 cannot represent exactly
+    rows=[(f"c{i:02d}", 0.1) for i in range(7)] + [("a", 0.5), ("z", 0.05)]
+    statements=[]
+    monkeypatch.setattr(pg_search, "SessionLocal", lambda: FakeSession(rows, statements))
+    monkeypatch.setattr(search, "use_pgvector", lambda: True)
+
+    async def all_pages():
+        seen=[]
+        after=None
+        while True:
+            page, after=await search.lexical_page("q", 3, "owner", 1.0, "pg:test", after)
+            seen.extend(hit["id"] for hit in page)
+            if after is None:
+                return seen
+            # the cursor travels through the client as base64 JSON
+            after=search.decode_cursor(search.encode_cursor({"pit": "pg:test", "fp": "x", "after": after}))["after"]
+
+    assert asyncio.run(all_pages())==["a"] + [f"c{i:02d}" for i in range(7)] + ["z"]
+    # both sides of the tie comparison are float8
+    keyset=[sql for sql in statements if "after_rank" in sql]
+    assert keyset and all("rank = CAST(:after_rank AS float8)" in sql and "rank < CAST(:after_rank AS float8)" in sql for sql in keyset)
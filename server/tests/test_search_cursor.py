@@ -0,0 +1,28 @@
+import pytest
+from app.utils import search
+
+
+def test_cursor_round_trips_and_is_url_safe():
+    data={"pit": "pg:abc", "fp": "f00", "after": [0.10000000149011612, "c-1"], "offset": 40}
+    cursor=search.encode_cursor(data)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert search.decode_cursor(cursor)==data
+
+
+def test_listing_cursor_needs_its_own_keys():
+    cursor=search.encode_cursor({"ts": 1700000000, "id": "c-9", "fp": "f00"})
+    assert search.decode_cursor(cursor, required=("ts", "id", "fp"))["id"]=="c-9"
+    with pytest.raises(ValueError):
+        search.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", search.encode_cursor({"pit": "x"}), "WzEsMl0"])
+def test_foreign_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        search.decode_cursor(cursor)
+
+
+def test_fingerprint_depends_on_every_part():
+    assert search.fingerprint("alice", ["a", "b"], None)==search.fingerprint("alice", ["a", "b"], None)
+    assert search.fingerprint("alice", ["a"], None)!=search.fingerprint("bob", ["a"], None)
+    assert search.fingerprint("q", "rrf", 1.0)!=search.fingerprint("q", "weighted", 1.0)
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from app.utils import search
+
+
+def ranking(*ids, scores=None):
+    scores=scores or [float(len(ids) - i) for i in range(len(ids))]
+    return [{"id": i, "score": s} for i, s in zip(ids, scores)]
+
+
+def test_rrf_rewards_documents_found_by_both_retrievers():
+    fused=search.reciprocal_rank_fusion(
+        {"lexical": ranking("a", "b", "c"), "vector": ranking("c", "d")},
+        {"lexical": 1.0, "vector": 1.0},
+        rank_constant=60,
+    )
+    assert fused[0]["id"]=="c"
+    assert fused[0]["score"]==pytest.approx(1 / 63 + 1 / 61)
+    assert (fused[0]["lexical_rank"], fused[0]["vector_rank"])==(3, 1)
+    assert {h["id"] for h in fused}=={"a", "b", "c", "d"}
+
+
+def test_rrf_weights_scale_each_retriever():
+    rankings={"lexical": ranking("a"), "vector": ranking("b")}
+    fused=search.reciprocal_rank_fusion(rankings, {"lexical": 1.0, "vector": 2.0}, rank_constant=60)
+    assert [h["id"] for h in fused]==["b", "a"]
+    assert fused[0]["score"]==pytest.approx(2 / 61)
+
+
+def test_weighted_fusion_normalises_unbounded_scores():
+    # BM25 scores in the tens must not drown kNN scores below 1
+    fused=search.weighted_fusion(
+        {"lexical": ranking("a", "b", scores=[40.0, 10.0]), "vector": ranking("b", "a", scores=[0.9, 0.3])},
+        {"lexical": 1.0, "vector": 1.0},
+    )
+    scores={h["id"]: h["score"] for h in fused}
+    assert scores=={"a": pytest.approx(1.0), "b": pytest.approx(1.0)}
+
+
+def test_weighted_fusion_with_equal_scores_and_empty_rankings():
+    fused=search.weighted_fusion({"lexical": ranking("a", "b", scores=[2.0, 2.0]), "vector": []}, {})
+    assert [h["score"] for h in fused]==[1.0, 1.0]
+
+
+def test_hybrid_search_survives_one_failing_retriever(monkeypatch):
+    async def lexical_search(text, size, owner, timeout, pit=None):
+        return ranking("a", "b")
+
+    async def vector_search(text, size, owner, timeout, pit=None):
+        raise TimeoutError("knn timed out")
+
+    monkeypatch.setattr(search, "lexical_search", lexical_search)
+    monkeypatch.setattr(search, "vector_search", vector_search)
+    hits, more=asyncio.run(search.hybrid_search("q", 1, "owner", 1.0))
+    assert [h["id"] for h in hits]==["a"] and more
+
+
+def test_hybrid_search_raises_when_both_retrievers_fail(monkeypatch):
+    async def failing(text, size, owner, timeout, pit=None):
+        raise TimeoutError("down")
+
+    monkeypatch.setattr(search, "lexical_search", failing)
+    monkeypatch.setattr(search, "vector_search", failing)
+    with pytest.raises(TimeoutError):
+        asyncio.run(search.hybrid_search("q", 5, "owner", 1.0))
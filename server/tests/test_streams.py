@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from app.utils import streams
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected=False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def slow_answer(closed):
+    async def gen():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.append(True)
+    return gen()
+
+
+def test_heartbeat_while_source_is_silent():
+    async def run():
+        closed=[]
+        request=FakeRequest()
+        out=[]
+        async for item in streams.with_heartbeats(slow_answer(closed), request, interval=0.01):
+            out.append(item)
+            if len(out)==3:
+                break
+        return out, closed
+
+    out, closed=asyncio.run(run())
+    assert out==["first", None, None]
+
+
+def test_disconnect_mid_answer_closes_the_source():
+    async def run():
+        closed=[]
+        request=FakeRequest()
+        out=[]
+        async for item in streams.with_heartbeats(slow_answer(closed), request, interval=0.01):
+            out.append(item)
+            if item is None:
+                # the client goes away while the next chunk is still being read
+                request.disconnected=True
+        return out, closed
+
+    out, closed=asyncio.run(run())
+    assert out==["first", None]
+    assert closed==[True]
+
+
+def test_cancel_mid_answer_raises_cancelled():
+    async def run():
+        closed=[]
+        request=FakeRequest()
+        started=asyncio.Event()
+
+        async def consume():
+            async for item in streams.with_heartbeats(slow_answer(closed), request, interval=30):
+                started.set()
+
+        task=asyncio.ensure_future(consume())
+        await started.wait()
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return closed
+
+    assert asyncio.run(run())==[True]
+
+
+def test_slots_are_capped_per_user():
+    owner="slots-user"
+    taken=[streams.acquire(owner) for _ in range(streams.MAX_STREAMS_PER_USER)]
+    assert all(taken)
+    assert not streams.acquire(owner)
+    for _ in taken:
+        streams.release(owner, completed=True)
+    assert streams.acquire(owner)
+    streams.release(owner, completed=False)
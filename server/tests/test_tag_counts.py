@@ -0,0 +1,59 @@
+from sqlalchemy.dialects import postgresql
+from app.utils import tag_counts
+
+
+def compile(statement):
+    return statement.compile(dialect=postgresql.dialect())
+
+
+def test_deltas_only_cover_added_and_removed_tags():
+    assert tag_counts.deltas(["a", "b"], ["b", "c"])=={"a": -1, "c": 1}
+    assert tag_counts.deltas(["a", "b"], ["b", "a"])=={}
+
+
+def test_deltas_count_a_repeated_tag_once():
+    assert tag_counts.deltas([], ["a", "a", "b"])=={"a": 1, "b": 1}
+    assert tag_counts.deltas(["a", "a"], [])=={"a": -1}
+
+
+def test_deltas_accept_missing_tag_lists():
+    assert tag_counts.deltas(None, ["a"])=={"a": 1}
+    assert tag_counts.deltas(["a"], None)=={"a": -1}
+    assert tag_counts.deltas(None, None)=={}
+
+
+def test_no_statements_without_changes():
+    assert tag_counts.statements({})==[]
+    assert tag_counts.statements({"": 1, "a": 0})==[]
+
+
+def test_one_upsert_for_all_increments():
+    statements=tag_counts.statements({"b": 1, "a": 2})
+    assert len(statements)==1
+    compiled=compile(statements[0])
+    sql=str(compiled)
+    assert sql.startswith("INSERT INTO tags (id, tagname, count) VALUES")
+    assert "ON CONFLICT (tagname) DO UPDATE SET count = greatest(tags.count + excluded.count" in sql
+    # rows go in tagname order so concurrent saves lock them in the same order
+    assert [compiled.params["tagname_m0"], compiled.params["tagname_m1"]]==["a", "b"]
+    assert [compiled.params["count_m0"], compiled.params["count_m1"]]==[2, 1]
+
+
+def test_decrements_also_drop_tags_nobody_uses():
+    upsert, cleanup=tag_counts.statements({"a": 1, "b": -1})
+    assert "ON CONFLICT (tagname) DO UPDATE" in str(compile(upsert))
+    compiled=compile(cleanup)
+    assert str(compiled).startswith("DELETE FROM tags WHERE tags.tagname IN")
+    assert "tags.count <= " in str(compiled)
+    assert compiled.params["tagname_1"]==["b"]
+
+
+def test_apply_runs_every_statement():
+    executed=[]
+
+    class Session:
+        def execute(self, statement):
+            executed.append(statement)
+
+    tag_counts.apply(Session(), tag_counts.deltas(["old"], ["new"]))
+    assert len(executed)==2
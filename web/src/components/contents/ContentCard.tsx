@@ -115,10 +115,12 @@ export default function ContentCard({ content, view }: ContentCardProps) {
 			);
 			if (response.status === 200) {
 				toast.success("Child added successfully!");
-				const newChildren = [
-					...content["all-children"],
-					childId.trim(),
-				];
+				// connecting an existing child again is a no-op on the server
+				const newChildren = content["all-children"].includes(
+					childId.trim()
+				)
+					? content["all-children"]
+					: [...content["all-children"], childId.trim()];
 				updateContent(content.id, { "all-children": newChildren });
 				addLink({
 					source: content.id,
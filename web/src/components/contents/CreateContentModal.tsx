@@ -328,7 +328,7 @@ export default function CreateContentModal() {
 				);
 
 				const responseData = response.data as ApiResponseData;
-				if (response.status === 201) {
+				if (response.status === 201 || response.status === 202) {
 					const content = { ...responseData.content! };
 					addContent(content);
 					addNode(content.id);
@@ -55,7 +55,8 @@ export default function SearchSection() {
 				`${backendUrl}/api/contents/search`,
 				{
 					input: q,
-					isVector: false,
+					mode: "hybrid",
+					k: 5,
 				},
 				{
 					headers: {
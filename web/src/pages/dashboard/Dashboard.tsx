@@ -68,8 +68,9 @@ export default function Dashboard() {
 					return;
 				}
 
-				const response = await axios.get(
-					`/api/contents/?username=${user.username}`,
+				// the listing is paginated: show the first page right away, then append the rest
+				let response = await axios.get(
+					`/api/contents/?username=${user.username}&limit=500`,
 					{
 						headers: {
 							Authorization: `Bearer ${accessToken}`,
@@ -77,11 +78,24 @@ export default function Dashboard() {
 					}
 				);
 
-				const responseData: ApiResponseData =
+				let responseData: ApiResponseData =
 					response.data as ApiResponseData;
 				if (response.status === 200) {
-					const contents = responseData.contents!;
-					setContents(contents);
+					const contents = [...responseData.contents!];
+					setContents([...contents]);
+					while (responseData.next_cursor) {
+						response = await axios.get(
+							`/api/contents/?username=${user.username}&limit=500&cursor=${encodeURIComponent(responseData.next_cursor)}`,
+							{
+								headers: {
+									Authorization: `Bearer ${accessToken}`,
+								},
+							}
+						);
+						responseData = response.data as ApiResponseData;
+						contents.push(...(responseData.contents || []));
+						setContents([...contents]);
+					}
 					clear();
 					contents.forEach((content) => {
 						addNode(content.id);
@@ -6,7 +6,7 @@ import { useDashboardStore } from "../../store/dashboardStore";
 import { useAttributeStore, useNodeStore } from "../../store/nodeStore";
 import { Graph } from "./graph/graph";
 import GraphOptions from "./GraphOptions";
-import type { Content } from "../../types/apiResponse";
+import type { Content, GraphResponse } from "../../types/apiResponse";
 import Icon from "../../ui/Icon";
 import { RiResetLeftFill } from "react-icons/ri";
 import { ThemeButton } from "../../components/dashboard/NavBar";
@@ -99,37 +99,54 @@ export default function Graphview() {
 				return;
 			}
 
-			const user = JSON.parse(userString);
 			try {
 				const backendUrl = import.meta.env.VITE_BACKEND_URL;
+				// nodes and edges of the whole library in one request
 				const response = await axios.get(
-					`${backendUrl}/api/contents/?username=${user.username}`,
+					`${backendUrl}/api/contents/graph`,
 					{
 						headers: { Authorization: `Bearer ${accessToken}` },
 					}
 				);
 
 				if (response.status === 200) {
-					const data = response.data;
-					const serverContents: Content[] = data.contents || [];
+					const graphData = response.data as GraphResponse;
+					const children = new Map<string, string[]>();
+					graphData.edges.forEach(([parent, child]) => {
+						children.set(parent, [
+							...(children.get(parent) || []),
+							child,
+						]);
+					});
+					// the graph only needs what labels and previews show
+					const serverContents: Content[] = graphData.nodes.map(
+						(node) => ({
+							id: node.id,
+							url: node.url,
+							description: node.description,
+							color: node.color,
+							timestamp: node.timestamp,
+							tags: [],
+							url_data: {
+								domain: node.domain,
+								favicon: node.favicon,
+								site_name: node.site_name,
+							},
+							"all-children": children.get(node.id) || [],
+						})
+					);
 					setContents(serverContents);
 					clear();
 					serverContents.forEach((content: Content) => {
 						addNode(content.id);
-						if (
-							content["all-children"] &&
-							content["all-children"].length > 0
-						) {
-							const children = content["all-children"];
-							children.forEach((child: string) => {
-								addLink({
-									source: content.id,
-									destination: child,
-									target: child,
-									value: Math.floor(Math.random() * 10) + 1,
-								});
-							});
-						}
+					});
+					graphData.edges.forEach(([parent, child]) => {
+						addLink({
+							source: parent,
+							destination: child,
+							target: child,
+							value: Math.floor(Math.random() * 10) + 1,
+						});
 					});
 				} else {
 					console.warn("Unable to fetch contents", response.status);
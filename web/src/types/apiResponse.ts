@@ -21,6 +21,26 @@ export interface Content {
 	url_data: UrlData;
 	"all-children": string[];
 }
+export interface GraphNode {
+	id: string;
+	url: string;
+	title?: string;
+	description?: string;
+	color: string;
+	timestamp: number;
+	domain: string;
+	site_name: string;
+	favicon?: string;
+	depth?: number;
+}
+export interface GraphResponse {
+	message: string;
+	success: boolean;
+	nodes: GraphNode[];
+	edges: [string, string][];
+	truncated: boolean;
+	version: number;
+}
 export interface Tag {
 	id: string;
 	tagname: string;
@@ -35,6 +55,7 @@ export interface ApiResponseData {
 	user?: User;
 	content?: Content;
 	contents?: Content[];
+	next_cursor?: string | null;
 	count?: number;
 	all_children?: string[];
 	hits_count?: number;